@@ -0,0 +1,29 @@
+"""add composite index for keyset pagination on files
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Composite index matching list_files: WHERE user_id, is_deleted ORDER BY uploaded_at DESC, id DESC
+    op.create_index(
+        'ix_files_user_deleted_uploaded_id',
+        'files',
+        ['user_id', 'is_deleted', sa.text('uploaded_at DESC'), sa.text('id DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_user_deleted_uploaded_id', table_name='files')
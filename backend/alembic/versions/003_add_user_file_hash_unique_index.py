@@ -0,0 +1,37 @@
+"""replace global file_hash unique with per-user partial unique index
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # file_hash is now unique per user (among live files), not globally
+    op.drop_index('ix_files_file_hash', table_name='files')
+    op.create_index('ix_files_file_hash', 'files', ['file_hash'])
+
+    # Arbiter index for INSERT ... ON CONFLICT (user_id, file_hash) WHERE is_deleted = false
+    op.create_index(
+        'uq_files_user_file_hash_active',
+        'files',
+        ['user_id', 'file_hash'],
+        unique=True,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_files_user_file_hash_active', table_name='files')
+    op.drop_index('ix_files_file_hash', table_name='files')
+    op.create_index('ix_files_file_hash', 'files', ['file_hash'], unique=True)
@@ -0,0 +1,47 @@
+"""add generated search_text column with trigram index to files
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Concatenated filename + summary, kept in sync by Postgres
+    op.add_column('files', sa.Column(
+        'search_text',
+        sa.Text(),
+        sa.Computed(
+            "coalesce(original_filename, '') || ' ' || "
+            "coalesce(final_filename, '') || ' ' || "
+            "coalesce(summary, '')",
+            persisted=True
+        ),
+        nullable=True
+    ))
+
+    op.create_index(
+        'ix_files_search_text_trgm',
+        'files',
+        ['search_text'],
+        postgresql_using='gin',
+        postgresql_ops={'search_text': 'gin_trgm_ops'},
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_search_text_trgm', table_name='files')
+    op.drop_column('files', 'search_text')
@@ -0,0 +1,38 @@
+"""add index on collection_files.file_id
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The primary key (collection_id, file_id) can't serve lookups by file_id
+    # alone, which the ON DELETE CASCADE from files needs. Build it
+    # concurrently so collection writes aren't blocked meanwhile.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_collection_files_file_id',
+            'collection_files',
+            ['file_id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_collection_files_file_id',
+            table_name='collection_files',
+            postgresql_concurrently=True,
+        )
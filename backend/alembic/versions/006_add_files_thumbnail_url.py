@@ -0,0 +1,27 @@
+"""add persisted thumbnail URL to files
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Presigned thumbnail URL and its expiry, refreshed when close to expiring
+    op.add_column('files', sa.Column('thumbnail_url', sa.Text(), nullable=True))
+    op.add_column('files', sa.Column('thumbnail_url_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('files', 'thumbnail_url_expires_at')
+    op.drop_column('files', 'thumbnail_url')
@@ -0,0 +1,38 @@
+"""add generated mime_family column with per-user index to files
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Top-level MIME type, kept in sync by Postgres
+    op.add_column('files', sa.Column(
+        'mime_family',
+        sa.String(length=100),
+        sa.Computed("split_part(mime_type, '/', 1)", persisted=True),
+        nullable=True
+    ))
+
+    op.create_index(
+        'ix_files_user_mime_family',
+        'files',
+        ['user_id', 'mime_family'],
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_user_mime_family', table_name='files')
+    op.drop_column('files', 'mime_family')
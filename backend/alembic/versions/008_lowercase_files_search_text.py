@@ -0,0 +1,54 @@
+"""store files.search_text lowercased so searches use LIKE instead of ILIKE
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-15 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def _recreate_search_text(expression: str) -> None:
+    # A generated column's expression can't be altered in place
+    op.drop_index('ix_files_search_text_trgm', table_name='files')
+    op.drop_column('files', 'search_text')
+
+    op.add_column('files', sa.Column(
+        'search_text',
+        sa.Text(),
+        sa.Computed(expression, persisted=True),
+        nullable=True
+    ))
+
+    op.create_index(
+        'ix_files_search_text_trgm',
+        'files',
+        ['search_text'],
+        postgresql_using='gin',
+        postgresql_ops={'search_text': 'gin_trgm_ops'},
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def upgrade() -> None:
+    _recreate_search_text(
+        "lower(coalesce(original_filename, '') || ' ' || "
+        "coalesce(final_filename, '') || ' ' || "
+        "coalesce(summary, ''))"
+    )
+
+
+def downgrade() -> None:
+    _recreate_search_text(
+        "coalesce(original_filename, '') || ' ' || "
+        "coalesce(final_filename, '') || ' ' || "
+        "coalesce(summary, '')"
+    )
@@ -0,0 +1,43 @@
+"""store file_embeddings.embedding_vector as real[] instead of JSON
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-15 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A JSON number array becomes an array literal by swapping the brackets.
+    # JSON null (stored by the old JSON column for None) becomes SQL NULL.
+    op.alter_column(
+        'file_embeddings',
+        'embedding_vector',
+        type_=postgresql.ARRAY(postgresql.REAL()),
+        existing_type=sa.JSON(),
+        postgresql_using=(
+            "CASE WHEN embedding_vector IS NULL "
+            "OR json_typeof(embedding_vector) = 'null' THEN NULL "
+            "ELSE translate(embedding_vector::text, '[]', '{}')::real[] END"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'file_embeddings',
+        'embedding_vector',
+        type_=sa.JSON(),
+        existing_type=postgresql.ARRAY(postgresql.REAL()),
+        postgresql_using="array_to_json(embedding_vector)",
+    )
@@ -0,0 +1,47 @@
+"""generate files.search_vector from filename, summary and tags, with a GIN index
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-15 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # search_vector was never populated; replace it with a generated column
+    op.drop_column('files', 'search_vector')
+    op.add_column('files', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(final_filename, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(ai_tags::text, '')), 'C')",
+            persisted=True
+        ),
+        nullable=True
+    ))
+
+    op.create_index(
+        'ix_files_search_vector_gin',
+        'files',
+        ['search_vector'],
+        postgresql_using='gin',
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_search_vector_gin', table_name='files')
+    op.drop_column('files', 'search_vector')
+    op.add_column('files', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
@@ -0,0 +1,60 @@
+"""index file_tags by (tag_id, file_id) and backfill it from files.ai_tags
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-15 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Until now only files.ai_tags was written; copy existing tags into the
+    # normalized tables so tag lookups through file_tags see them
+    op.execute("""
+        INSERT INTO tags (id, name)
+        SELECT gen_random_uuid(), tag_name
+        FROM (
+            SELECT DISTINCT left(btrim(value), 100) AS tag_name
+            FROM files, json_array_elements_text(files.ai_tags) AS value
+            WHERE json_typeof(files.ai_tags) = 'array'
+        ) AS ai_tag_names
+        WHERE tag_name <> ''
+        ON CONFLICT (name) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO file_tags (file_id, tag_id, is_user_confirmed, created_at)
+        SELECT DISTINCT files.id, tags.id, false, now()
+        FROM files
+        CROSS JOIN json_array_elements_text(files.ai_tags) AS value
+        JOIN tags ON tags.name = left(btrim(value), 100)
+        WHERE json_typeof(files.ai_tags) = 'array'
+        ON CONFLICT (file_id, tag_id) DO NOTHING
+    """)
+
+    # The primary key (file_id, tag_id) can't serve lookups by tag. Build
+    # it concurrently so tag writes aren't blocked meanwhile.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_file_tags_tag_file',
+            'file_tags',
+            ['tag_id', 'file_id'],
+            postgresql_include=['confidence_score'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_file_tags_tag_file',
+            table_name='file_tags',
+            postgresql_concurrently=True,
+        )
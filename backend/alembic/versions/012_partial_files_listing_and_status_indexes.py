@@ -0,0 +1,64 @@
+"""make the file listing index partial and index in-flight processing status
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-15 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so uploads aren't blocked meanwhile
+    with op.get_context().autocommit_block():
+        # Listings only read live files: leave soft-deleted rows and the
+        # is_deleted key column out of the index
+        op.create_index(
+            'ix_files_user_uploaded_active',
+            'files',
+            ['user_id', sa.text('uploaded_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_deleted = false'),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_files_user_deleted_uploaded_id',
+            table_name='files',
+            postgresql_concurrently=True,
+        )
+
+        op.create_index(
+            'ix_files_processing_status',
+            'files',
+            ['processing_status', 'uploaded_at'],
+            postgresql_where=sa.text("processing_status IN ('pending', 'processing')"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_files_processing_status',
+            table_name='files',
+            postgresql_concurrently=True,
+        )
+
+        op.create_index(
+            'ix_files_user_deleted_uploaded_id',
+            'files',
+            ['user_id', 'is_deleted', sa.text('uploaded_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_files_user_uploaded_active',
+            table_name='files',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,38 @@
+"""generate primary key UUIDs in Postgres with gen_random_uuid()
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-15 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+# Tables whose UUID primary key was generated client-side
+TABLES = (
+    'users',
+    'files',
+    'tags',
+    'collections',
+    'collection_shares',
+    'file_embeddings',
+    'activity_logs',
+)
+
+
+def upgrade() -> None:
+    # gen_random_uuid() is built in since PostgreSQL 13
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT gen_random_uuid()")
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT")
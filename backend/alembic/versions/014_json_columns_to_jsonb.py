@@ -0,0 +1,74 @@
+"""store files.ai_tags, files.file_metadata and activity_logs.details as jsonb
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-15 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('english', coalesce(final_filename, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(ai_tags::text, '')), 'C')"
+)
+
+
+def _drop_search_vector() -> None:
+    # search_vector is generated from ai_tags, and Postgres won't change the
+    # type of a column a generated column depends on
+    op.drop_index('ix_files_search_vector_gin', table_name='files')
+    op.drop_column('files', 'search_vector')
+
+
+def _add_search_vector() -> None:
+    op.add_column('files', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+        nullable=True
+    ))
+    op.create_index(
+        'ix_files_search_vector_gin',
+        'files',
+        ['search_vector'],
+        postgresql_using='gin',
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def _alter_json_columns(type_, existing_type, cast: str) -> None:
+    for table, column in (
+        ('files', 'ai_tags'),
+        ('files', 'file_metadata'),
+        ('activity_logs', 'details'),
+    ):
+        op.alter_column(
+            table,
+            column,
+            type_=type_,
+            existing_type=existing_type,
+            postgresql_using=f"{column}::{cast}",
+        )
+
+
+def upgrade() -> None:
+    _drop_search_vector()
+    _alter_json_columns(postgresql.JSONB(), sa.JSON(), 'jsonb')
+    _add_search_vector()
+
+
+def downgrade() -> None:
+    _drop_search_vector()
+    _alter_json_columns(sa.JSON(), postgresql.JSONB(), 'json')
+    _add_search_vector()
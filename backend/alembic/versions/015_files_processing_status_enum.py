@@ -0,0 +1,65 @@
+"""store files.processing_status as a native enum
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-15 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+processing_status_enum = postgresql.ENUM(
+    'pending',
+    'processing',
+    'completed',
+    'failed',
+    name='processing_status_t'
+)
+
+
+def _create_in_flight_index() -> None:
+    op.create_index(
+        'ix_files_processing_status',
+        'files',
+        ['processing_status', 'uploaded_at'],
+        postgresql_where=sa.text("processing_status IN ('pending', 'processing')"),
+    )
+
+
+def upgrade() -> None:
+    processing_status_enum.create(op.get_bind(), checkfirst=True)
+
+    # The partial index's predicate compares against text literals; rebuild
+    # it against the enum rather than let ALTER TYPE carry text casts over
+    op.drop_index('ix_files_processing_status', table_name='files')
+    op.alter_column(
+        'files',
+        'processing_status',
+        type_=processing_status_enum,
+        existing_type=sa.String(50),
+        postgresql_using='processing_status::processing_status_t',
+    )
+    _create_in_flight_index()
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_processing_status', table_name='files')
+    op.alter_column(
+        'files',
+        'processing_status',
+        type_=sa.String(50),
+        existing_type=processing_status_enum,
+        postgresql_using='processing_status::text',
+    )
+    _create_in_flight_index()
+
+    processing_status_enum.drop(op.get_bind(), checkfirst=True)
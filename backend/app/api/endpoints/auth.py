@@ -4,7 +4,7 @@ from sqlalchemy import select
 import logging
 
 from app.core.database import get_db
-from app.core.security import create_access_token, get_current_user
+from app.core.security import create_access_token, get_current_user, invalidate_cached_user
 from app.models.database import User
 from app.schemas.user import TokenResponse, UserResponse, UserCreate
 
@@ -37,14 +37,13 @@ async def line_login(
             )
             db.add(user)
             await db.commit()
-            await db.refresh(user)
             logger.info(f"Created new user: {user.line_user_id}")
         else:
             # Update existing user info
             user.display_name = user_data.display_name
             user.picture_url = user_data.picture_url
             await db.commit()
-            await db.refresh(user)
+            await invalidate_cached_user(user.id)
             logger.info(f"Updated existing user: {user.line_user_id}")
 
         # Create access token
@@ -52,7 +51,7 @@ async def line_login(
 
         return TokenResponse(
             access_token=access_token,
-            user=UserResponse.from_orm(user)
+            user=UserResponse.model_validate(user)
         )
 
     except Exception as e:
@@ -68,4 +67,4 @@ async def get_current_user_info(
     user: User = Depends(get_current_user)
 ):
     """Get current user information"""
-    return UserResponse.from_orm(user)
+    return UserResponse.model_validate(user)
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from typing import List
 import logging
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from uuid import UUID
 from datetime import datetime
 
@@ -31,9 +32,12 @@ class CollectionResponse(BaseModel):
     is_public: bool
     created_at: datetime
     updated_at: datetime = None
+    file_count: int = 0
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+_collections_adapter = TypeAdapter(List[CollectionResponse])
 
 
 @router.post("/", response_model=CollectionResponse)
@@ -53,11 +57,10 @@ async def create_collection(
 
         db.add(collection)
         await db.commit()
-        await db.refresh(collection)
 
         logger.info(f"Created collection: {collection.id}")
 
-        return CollectionResponse.from_orm(collection)
+        return CollectionResponse.model_validate(collection)
 
     except Exception as e:
         logger.error(f"Error creating collection: {e}")
@@ -74,12 +77,21 @@ async def list_collections(
 ):
     """List user's collections"""
     try:
+        # Load collections with their file counts in one query
+        # (collection_files' primary key leads with collection_id)
         result = await db.execute(
-            select(Collection).where(Collection.user_id == current_user.id)
+            select(Collection, func.count(CollectionFile.file_id))
+            .outerjoin(CollectionFile, CollectionFile.collection_id == Collection.id)
+            .where(Collection.user_id == current_user.id)
+            .group_by(Collection.id)
         )
-        collections = result.scalars().all()
 
-        return [CollectionResponse.from_orm(c) for c in collections]
+        rows = result.all()
+        collections = _collections_adapter.validate_python([collection for collection, _ in rows])
+        for response, (_, file_count) in zip(collections, rows):
+            response.file_count = file_count
+
+        return collections
 
     except Exception as e:
         logger.error(f"Error listing collections: {e}")
@@ -98,42 +110,38 @@ async def add_file_to_collection(
 ):
     """Add a file to a collection"""
     try:
-        # Verify collection ownership
-        result = await db.execute(
-            select(Collection).where(
-                Collection.id == collection_id,
-                Collection.user_id == current_user.id
-            )
+        # Add file to collection in one statement: the INSERT ... SELECT only
+        # yields a row if the caller owns the collection, and a file that is
+        # already present is skipped by ON CONFLICT
+        owned_collection = select(Collection.id).where(
+            Collection.id == collection_id,
+            Collection.user_id == current_user.id
         )
-        collection = result.scalar_one_or_none()
-
-        if not collection:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Collection not found"
-            )
-
-        # Check if file already in collection
         result = await db.execute(
-            select(CollectionFile).where(
-                CollectionFile.collection_id == collection_id,
-                CollectionFile.file_id == file_id
+            pg_insert(CollectionFile)
+            .from_select(
+                [CollectionFile.collection_id, CollectionFile.file_id],
+                owned_collection.add_columns(literal(file_id, CollectionFile.file_id.type))
             )
+            .on_conflict_do_nothing(index_elements=[
+                CollectionFile.collection_id,
+                CollectionFile.file_id
+            ])
+            .returning(CollectionFile.file_id)
         )
-        existing = result.scalar_one_or_none()
+        inserted = result.scalar_one_or_none()
+        await db.commit()
 
-        if existing:
+        if inserted is None:
+            # Nothing inserted: tell apart a foreign/missing collection from a duplicate
+            result = await db.execute(owned_collection)
+            if result.scalar_one_or_none() is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Collection not found"
+                )
             return {"message": "File already in collection"}
 
-        # Add file to collection
-        collection_file = CollectionFile(
-            collection_id=collection_id,
-            file_id=file_id
-        )
-
-        db.add(collection_file)
-        await db.commit()
-
         logger.info(f"Added file {file_id} to collection {collection_id}")
 
         return {"message": "File added to collection"}
@@ -157,37 +165,35 @@ async def remove_file_from_collection(
 ):
     """Remove a file from a collection"""
     try:
-        # Verify collection ownership
-        result = await db.execute(
-            select(Collection).where(
-                Collection.id == collection_id,
-                Collection.user_id == current_user.id
-            )
+        # Remove file from collection, checking collection ownership in the same statement
+        owned_collection = select(Collection.id).where(
+            Collection.id == collection_id,
+            Collection.user_id == current_user.id
         )
-        collection = result.scalar_one_or_none()
-
-        if not collection:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Collection not found"
-            )
-
-        # Remove file from collection
         result = await db.execute(
-            select(CollectionFile).where(
+            delete(CollectionFile)
+            .where(
                 CollectionFile.collection_id == collection_id,
-                CollectionFile.file_id == file_id
+                CollectionFile.file_id == file_id,
+                CollectionFile.collection_id.in_(owned_collection)
             )
+            .returning(CollectionFile.file_id)
         )
-        collection_file = result.scalar_one_or_none()
-
-        if not collection_file:
+        removed = result.scalar_one_or_none()
+
+        if removed is None:
+            # Nothing deleted: tell apart a foreign/missing collection from a missing file
+            result = await db.execute(owned_collection)
+            if result.scalar_one_or_none() is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Collection not found"
+                )
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="File not in collection"
             )
 
-        await db.delete(collection_file)
         await db.commit()
 
         logger.info(f"Removed file {file_id} from collection {collection_id}")
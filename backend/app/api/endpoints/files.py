@@ -1,63 +1,382 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
-from typing import Optional, List
-import logging
+from sqlalchemy import select, update, func, tuple_, bindparam, true, false
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Optional, List, Tuple, Dict
+import asyncio
 import io
-from datetime import datetime
-
-from app.core.database import get_db
+import logging
+import hashlib
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from urllib.parse import quote
+
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.security import get_current_user
 from app.core.config import settings
+from app.core.cache import get_cache, file_list_version_key
 from app.models.database import User, File as FileModel
 from app.schemas.file import FileResponse, FileListResponse, FileUploadResponse, FileUpdate
-from app.services.storage_service import storage_service
-from app.services.ai_service import ai_service
-from app.services.vector_service import vector_service
+from app.services.storage_service import storage_service, PRESIGNED_URL_MIN_VALIDITY
+from app.services.tag_service import build_replace_file_tags
 from app.utils.file_utils import (
     get_mime_type,
+    MIME_SNIFF_SIZE,
     is_allowed_file,
-    generate_unique_filename,
-    sanitize_filename
+    generate_blob_path,
+    sanitize_filename,
+    escape_like
 )
-from app.utils.text_extractor import TextExtractor
-from app.workers.tasks.file_processing import process_uploaded_file
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.workers.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Upper bound on how long one upload holds the per-blob in-flight lock
+UPLOAD_INFLIGHT_TTL = 120
+UPLOAD_INFLIGHT_POLL_INTERVAL = 0.25
+
+# How long browsers may reuse a download redirect. Kept inside the presigned
+# URL cache's PRESIGNED_URL_MIN_VALIDITY so a reused redirect never expires.
+DOWNLOAD_REDIRECT_MAX_AGE = 300
+
+# Dispatched by name so the API doesn't import the worker's task modules
+PROCESS_UPLOADED_FILE_TASK = "app.workers.tasks.file_processing.process_uploaded_file"
+
+# Columns backing FileResponse. list_files selects only these as plain rows:
+# no ORM instances per row, and the generated search_text is never fetched.
+_file_list_columns = [
+    FileModel.__table__.c[name]
+    for name in FileResponse.model_fields
+    if name in FileModel.__table__.c
+]
+
+# Ownership lookup shared by the per-file endpoints. Built once so each call
+# only binds parameters and hits the engine's compiled-statement cache.
+_owned_file_query = select(FileModel).where(
+    FileModel.id == bindparam("file_id"),
+    FileModel.user_id == bindparam("user_id"),
+    FileModel.is_deleted == False
+)
+
+
+def _file_count_cache_key(user_id, version: str, search: Optional[str]) -> str:
+    search_digest = hashlib.sha1((search or "").encode('utf-8')).hexdigest()
+    return f"files_count:{user_id}:{version}:{search_digest}"
 
-async def add_thumbnail_url(file_response: FileResponse) -> FileResponse:
+
+def _file_list_cache_key(
+    user_id,
+    version: str,
+    cursor: Optional[str],
+    page_size: int,
+    search: Optional[str],
+    include_total: bool
+) -> str:
+    params = f"{cursor or ''}\0{page_size}\0{search or ''}\0{int(include_total)}"
+    params_digest = hashlib.sha1(params.encode('utf-8')).hexdigest()
+    return f"files:list:{user_id}:{version}:{params_digest}"
+
+
+async def get_file_list_version(user_id) -> Optional[str]:
     """
-    Add thumbnail_url to FileResponse if thumbnail_path exists
+    Get the version of a user's cached file list
 
-    Args:
-        file_response: FileResponse object
+    Every write that changes the list bumps the version, so cached pages and
+    counts keyed on it go stale at once without scanning for their keys.
+
+    Returns None if Redis is unavailable, which disables list caching.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    try:
+        return await cache.get(file_list_version_key(user_id)) or "0"
+    except Exception as e:
+        logger.warning(f"Error reading file list cache version: {e}")
+        return None
+
+
+async def invalidate_file_list_cache(user_id) -> None:
+    """Invalidate a user's cached file list pages and counts"""
+    cache = get_cache()
+    if cache is None:
+        return
+
+    try:
+        await cache.incr(file_list_version_key(user_id))
+    except Exception as e:
+        logger.warning(f"Error invalidating file list cache: {e}")
+
+
+async def get_cached_file_list(cache_key: str) -> Optional[str]:
+    """Get a serialized list_files page from Redis, or None on a miss"""
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    try:
+        return await cache.get(cache_key)
+    except Exception as e:
+        logger.warning(f"Error reading file list cache: {e}")
+        return None
+
+
+async def cache_file_list(cache_key: str, payload: str) -> None:
+    """Store a serialized list_files page in Redis for FILE_LIST_CACHE_TTL seconds"""
+    cache = get_cache()
+    if cache is None:
+        return
+
+    try:
+        await cache.setex(cache_key, settings.FILE_LIST_CACHE_TTL, payload)
+    except Exception as e:
+        logger.warning(f"Error writing file list cache: {e}")
+
+
+async def get_cached_file_count(user_id, version: str, search: Optional[str]) -> Optional[int]:
+    """
+    Get a cached list_files total from Redis
+
+    Returns None on a miss or if Redis is unavailable.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    try:
+        raw = await cache.get(_file_count_cache_key(user_id, version, search))
+        return int(raw) if raw is not None else None
+    except Exception as e:
+        logger.warning(f"Error reading file count cache: {e}")
+        return None
+
+
+async def cache_file_count(user_id, version: str, search: Optional[str], total: int) -> None:
+    """Store a list_files total in Redis for FILE_COUNT_CACHE_TTL seconds"""
+    cache = get_cache()
+    if cache is None:
+        return
+
+    try:
+        await cache.setex(
+            _file_count_cache_key(user_id, version, search),
+            settings.FILE_COUNT_CACHE_TTL,
+            total
+        )
+    except Exception as e:
+        logger.warning(f"Error writing file count cache: {e}")
+
+
+def _hash_upload(file_io) -> Tuple[str, int, bytes]:
+    """
+    Hash a spooled upload
+
+    The size comes from the spool itself, so oversized uploads are never
+    read; the caller checks the returned size. hashlib.file_digest reads
+    into one reusable buffer and hashes without a Python-level loop.
 
     Returns:
-        Updated FileResponse with thumbnail_url
+        (sha256 hex digest, size in bytes, leading bytes for MIME sniffing);
+        the digest and head are empty if the upload is over MAX_FILE_SIZE
+    """
+    file_size = file_io.seek(0, io.SEEK_END)
+    if file_size > settings.MAX_FILE_SIZE:
+        return "", file_size, b""
+
+    file_io.seek(0)
+    file_head = file_io.read(MIME_SNIFF_SIZE)
+
+    file_io.seek(0)
+    file_hash = hashlib.file_digest(file_io, "sha256").hexdigest()
+
+    return file_hash, file_size, file_head
+
+
+async def upload_blob_once(file_io, object_name: str, content_type: str) -> None:
+    """
+    Store a content-addressed blob, letting only one request upload it
+
+    Concurrent uploads of the same content (client retries, several users
+    sharing a file) would otherwise all PUT identical bytes to MinIO. The
+    first takes a Redis lock on the blob; the rest wait for it to finish and
+    then find the object already stored. Without Redis, or if the lock holder
+    outlives UPLOAD_INFLIGHT_TTL, callers fall back to a plain upload.
+
+    Args:
+        file_io: File-like object holding the content
+        object_name: Content-addressed object key
+        content_type: MIME type stored with the object
     """
-    if file_response.thumbnail_path:
+    cache = get_cache()
+    lock_key = f"upload_inflight:{object_name}"
+    lock_token = None
+
+    if cache is not None:
         try:
-            thumbnail_url = await storage_service.get_presigned_url(
-                file_response.thumbnail_path
-            )
-            file_response.thumbnail_url = thumbnail_url
+            token = uuid.uuid4().hex
+            if await cache.set(lock_key, token, nx=True, ex=UPLOAD_INFLIGHT_TTL):
+                lock_token = token
+            else:
+                # Someone else is uploading this blob; wait for them to finish
+                deadline = time.monotonic() + UPLOAD_INFLIGHT_TTL
+                while time.monotonic() < deadline and await cache.exists(lock_key):
+                    await asyncio.sleep(UPLOAD_INFLIGHT_POLL_INTERVAL)
         except Exception as e:
-            logger.warning(f"Failed to generate thumbnail URL: {e}")
-            file_response.thumbnail_url = None
-    return file_response
+            logger.warning(f"Error taking upload lock: {e}")
+
+    try:
+        await storage_service.upload_file(
+            file_data=file_io,
+            object_name=object_name,
+            content_type=content_type,
+            skip_existing=True
+        )
+    finally:
+        if lock_token is not None:
+            try:
+                # Don't release a lock that expired and was taken by someone else
+                if await cache.get(lock_key) == lock_token:
+                    await cache.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Error releasing upload lock: {e}")
+
+
+async def dispatch_file_processing(file_id, user_id) -> None:
+    """
+    Queue AI processing for an uploaded file
+
+    Runs as a background task after the upload response has been sent, so
+    broker latency stays off the request path. The request's session is
+    closed by then, so marking the file failed uses a session of its own.
+
+    Args:
+        file_id: UUID of the file record
+        user_id: UUID of the uploader
+    """
+    try:
+        task = await asyncio.to_thread(
+            celery_app.send_task,
+            PROCESS_UPLOADED_FILE_TASK,
+            kwargs={"file_id": str(file_id), "user_id": str(user_id)},
+            ignore_result=True
+        )
+        logger.info(f"Background task dispatched: task_id={task.id}, file_id={file_id}")
+
+    except Exception as e:
+        logger.error(f"Error dispatching background task: {e}")
+        # If task dispatch fails, mark file as failed
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(FileModel)
+                .where(FileModel.id == file_id)
+                .values(processing_status='failed')
+            )
+            await db.commit()
+        await invalidate_file_list_cache(user_id)
+
+
+async def fill_thumbnail_urls(
+    file_responses: List[FileResponse],
+    url_expiry: Dict[UUID, Optional[datetime]],
+    background_tasks: BackgroundTasks
+) -> None:
+    """
+    Set thumbnail_url on files that have a thumbnail
+
+    Persisted URLs are served as-is while they have more than
+    PRESIGNED_URL_MIN_VALIDITY left. Missing or expiring ones are signed for
+    THUMBNAIL_URL_EXPIRES in one batch and written back after the response
+    is sent, so steady-state reads do no signing at all.
+
+    Args:
+        file_responses: Responses built from file rows (thumbnail_url as stored)
+        url_expiry: thumbnail_url_expires_at of each file, by file ID
+        background_tasks: Request background tasks, used to persist new URLs
+    """
+    now = datetime.now(timezone.utc)
+    stale = []
+    for response in file_responses:
+        if not response.thumbnail_path:
+            response.thumbnail_url = None
+            continue
+        expires_at = url_expiry.get(response.id)
+        if not response.thumbnail_url or not expires_at or expires_at - now <= PRESIGNED_URL_MIN_VALIDITY:
+            stale.append(response)
+
+    if not stale:
+        return
+
+    # Uncached signing, so the stored expiry is exact
+    expires = timedelta(seconds=settings.THUMBNAIL_URL_EXPIRES)
+    expires_at = now + expires
+    urls = await storage_service.get_presigned_urls_batch(
+        [response.thumbnail_path for response in stale],
+        expires,
+        cache=False
+    )
+
+    refreshed = []
+    for response in stale:
+        response.thumbnail_url = urls.get(response.thumbnail_path)
+        if response.thumbnail_url:
+            refreshed.append({
+                "file_id": response.id,
+                "path": response.thumbnail_path,
+                "url": response.thumbnail_url
+            })
+
+    if refreshed:
+        background_tasks.add_task(persist_thumbnail_urls, refreshed, expires_at)
+
+
+async def persist_thumbnail_urls(refreshed: List[Dict], expires_at: datetime) -> None:
+    """
+    Store re-signed thumbnail URLs in one executemany UPDATE
+
+    Rows whose thumbnail changed in the meantime are left alone, and
+    updated_at is kept since the file itself didn't change.
+    """
+    files_table = FileModel.__table__
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(files_table)
+                .where(
+                    files_table.c.id == bindparam("file_id"),
+                    files_table.c.thumbnail_path == bindparam("path")
+                )
+                .values(
+                    thumbnail_url=bindparam("url"),
+                    thumbnail_url_expires_at=expires_at,
+                    updated_at=files_table.c.updated_at
+                ),
+                refreshed
+            )
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Failed to persist thumbnail URLs: {e}")
 
 
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Upload a file and process it with AI
+    Upload a file and queue it for AI processing
+
+    Returns immediately with status 'pending'; text extraction, AI analysis
+    and vector indexing run in the Celery worker. Poll
+    GET /files/{file_id}/status for progress.
     """
     try:
         # Validate file
@@ -74,97 +393,109 @@ async def upload_file(
                 detail=f"File type not allowed. Allowed: {settings.ALLOWED_EXTENSIONS}"
             )
 
-        # Read file data
-        file_data = await file.read()
-        file_size = len(file_data)
-
-        # Check file size
+        too_large = HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Max size: {settings.MAX_FILE_SIZE} bytes"
+        )
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise too_large
+
+        # Starlette has already spooled the body (to disk past 1 MB), so hash
+        # it in place and hand that same file object to MinIO rather than
+        # copying it into a second buffer. The whole read+hash pass runs in
+        # one worker thread so large files don't hold up the event loop.
+        file_io = file.file
+        file_hash, file_size, file_head = await asyncio.to_thread(_hash_upload, file_io)
         if file_size > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large. Max size: {settings.MAX_FILE_SIZE} bytes"
-            )
+            raise too_large
 
-        # Calculate file hash
-        file_io = io.BytesIO(file_data)
-        file_hash = storage_service.calculate_hash(file_io)
+        # Get MIME type (libmagic only needs the start of the file)
+        mime_type = get_mime_type(file.filename, file_head)
 
-        # Check for duplicate
-        result = await db.execute(
-            select(FileModel).where(
-                FileModel.file_hash == file_hash,
-                FileModel.user_id == current_user.id,
-                FileModel.is_deleted == False
+        # Content-addressed storage path, shared by every row with this hash
+        storage_path = generate_blob_path(file_hash)
+
+        # Insert file record, or find the existing one, in a single round
+        # trip. The row stays uncommitted until the MinIO upload succeeds, so
+        # a concurrent upload of the same content waits on the unique index.
+        # The insert and the upload are independent, so they run concurrently;
+        # a wasted upload on a duplicate is harmless since blobs are keyed by hash.
+        sanitized_filename = sanitize_filename(file.filename)
+        new_file = (
+            pg_insert(FileModel)
+            .values(
+                user_id=current_user.id,
+                original_filename=file.filename,
+                final_filename=sanitized_filename,
+                file_path=storage_path,
+                file_size=file_size,
+                mime_type=mime_type,
+                file_hash=file_hash,
+                processing_status='pending'
+            )
+            .on_conflict_do_nothing(
+                index_elements=[FileModel.user_id, FileModel.file_hash],
+                index_where=FileModel.is_deleted == False
             )
+            .returning(FileModel.id)
+            .cte("new_file")
+        )
+        existing_file = select(FileModel.id, false()).where(
+            FileModel.user_id == current_user.id,
+            FileModel.file_hash == file_hash,
+            FileModel.is_deleted == False
+        )
+        insert_stmt = (
+            select(new_file.c.id, true().label("created"))
+            .union_all(existing_file)
+            .limit(1)
         )
-        existing_file = result.scalar_one_or_none()
 
-        if existing_file:
+        file_io.seek(0)
+        insert_result, upload_result = await asyncio.gather(
+            db.execute(insert_stmt),
+            upload_blob_once(file_io, storage_path, mime_type),
+            return_exceptions=True
+        )
+
+        if isinstance(insert_result, BaseException) or isinstance(upload_result, BaseException):
+            await db.rollback()
+            raise insert_result if isinstance(insert_result, BaseException) else upload_result
+
+        row = insert_result.first()
+
+        if row is None or not row.created:
+            await db.rollback()
+            if row is None:
+                # The conflicting row was committed after this statement's
+                # snapshot was taken, so look it up again
+                result = await db.execute(existing_file)
+                existing_id = result.scalar_one()
+            else:
+                existing_id = row.id
             logger.info(f"Duplicate file detected: {file_hash}")
             return FileUploadResponse(
-                file_id=existing_file.id,
+                file_id=existing_id,
                 message="File already exists",
                 status="duplicate"
             )
 
-        # Get MIME type
-        mime_type = get_mime_type(file.filename, file_data)
-
-        # Generate storage path
-        storage_path = generate_unique_filename(file.filename, str(current_user.id), file_hash)
-
-        # Upload to MinIO
-        file_io.seek(0)
-        await storage_service.upload_file(
-            file_data=file_io,
-            object_name=storage_path,
-            content_type=mime_type,
-            metadata={
-                "original_filename": file.filename,
-                "user_id": str(current_user.id)
-            }
-        )
-
-        # Create file record in database
-        sanitized_filename = sanitize_filename(file.filename)
-        file_record = FileModel(
-            user_id=current_user.id,
-            original_filename=file.filename,
-            final_filename=sanitized_filename,
-            file_path=storage_path,
-            file_size=file_size,
-            mime_type=mime_type,
-            file_hash=file_hash,
-            processing_status='pending'
-        )
+        file_id = row.id
 
-        db.add(file_record)
+        # The only commit on the success path: the row becomes visible
+        # together with its blob, and only then can the worker be queued
         await db.commit()
-        await db.refresh(file_record)
-
-        logger.info(f"File uploaded: {file_record.id}")
+        await invalidate_file_list_cache(current_user.id)
 
-        # Dispatch background task for AI processing
-        try:
-            task = process_uploaded_file.delay(
-                file_id=str(file_record.id),
-                user_id=str(current_user.id)
-            )
-
-            logger.info(f"Background task dispatched: task_id={task.id}, file_id={file_record.id}")
+        logger.info(f"File uploaded: {file_id}")
 
-        except Exception as e:
-            logger.error(f"Error dispatching background task: {e}")
-            # If task dispatch fails, mark file as failed
-            file_record.processing_status = 'failed'
-            file_record.error_message = f"Failed to start processing: {str(e)}"
-            await db.commit()
-            await db.refresh(file_record)
+        # Queue AI processing once the response is on its way
+        background_tasks.add_task(dispatch_file_processing, file_id, current_user.id)
 
         return FileUploadResponse(
-            file_id=file_record.id,
+            file_id=file_id,
             message="File uploaded successfully",
-            status=file_record.processing_status
+            status='pending'
         )
 
     except HTTPException:
@@ -179,62 +510,139 @@ async def upload_file(
 
 @router.get("/", response_model=FileListResponse)
 async def list_files(
-    page: int = Query(1, ge=1),
+    background_tasks: BackgroundTasks,
+    cursor: Optional[str] = None,
     page_size: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
+    include_total: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    List user's files with pagination and search
+    List user's files with keyset (cursor) pagination and search
+
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    The total count is only computed when `include_total=true`.
+
+    Pages are cached in Redis for FILE_LIST_CACHE_TTL seconds and dropped on
+    any write to the user's files, whether through this API or by the
+    Celery workers (processing, thumbnails, LINE ingest).
     """
     try:
+        # Serve repeated polls of the same page straight from the cache
+        cache_version = await get_file_list_version(current_user.id)
+        list_cache_key = None
+        if cache_version is not None:
+            list_cache_key = _file_list_cache_key(
+                current_user.id, cache_version, cursor, page_size, search, include_total
+            )
+            cached_page = await get_cached_file_list(list_cache_key)
+            if cached_page is not None:
+                return Response(content=cached_page, media_type="application/json")
+
         # Build query
-        query = select(FileModel).where(
+        query = select(*_file_list_columns, FileModel.thumbnail_url_expires_at).where(
             FileModel.user_id == current_user.id,
             FileModel.is_deleted == False
         )
 
         # Add search filter
         if search:
-            search_filter = or_(
-                FileModel.original_filename.ilike(f"%{search}%"),
-                FileModel.final_filename.ilike(f"%{search}%"),
-                FileModel.summary.ilike(f"%{search}%")
+            # search_text is stored lowercased and backed by a pg_trgm GIN
+            # index. Wildcards in the input are escaped: they'd change the
+            # match and a bare '%' makes the trigram index useless.
+            query = query.where(
+                FileModel.search_text.like(f"%{escape_like(search.lower())}%", escape="/")
             )
-            query = query.where(search_filter)
 
-        # Count total
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
+        # Count total (opt-in, it scans the whole filtered set). Cached per
+        # list version so paging through results doesn't recount every page.
+        # On the first page the count rides along with the data query as a
+        # window function; later pages are narrowed by the cursor, so a cache
+        # miss there needs its own COUNT.
+        total = None
+        total_pages = None
+        count_in_query = False
+        if include_total and cache_version is not None:
+            total = await get_cached_file_count(current_user.id, cache_version, search)
+        if include_total:
+            if total is None and not cursor:
+                query = query.add_columns(func.count().over().label("total_count"))
+                count_in_query = True
+            elif total is None:
+                count_query = select(func.count()).select_from(query.subquery())
+                total_result = await db.execute(count_query)
+                total = total_result.scalar()
+                if cache_version is not None:
+                    await cache_file_count(current_user.id, cache_version, search, total)
+
+        # Apply keyset pagination
+        if cursor:
+            try:
+                cursor_uploaded_at, cursor_id = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor"
+                )
+            query = query.where(
+                tuple_(FileModel.uploaded_at, FileModel.id) < tuple_(cursor_uploaded_at, cursor_id)
+            )
 
-        # Apply pagination
-        query = query.order_by(FileModel.uploaded_at.desc())
-        query = query.offset((page - 1) * page_size).limit(page_size)
+        # Fetch one extra row to know whether there is a next page
+        query = query.order_by(FileModel.uploaded_at.desc(), FileModel.id.desc())
+        query = query.limit(page_size + 1)
 
         # Execute query
         result = await db.execute(query)
-        files = result.scalars().all()
-
-        # Calculate total pages
-        total_pages = (total + page_size - 1) // page_size
-
-        # Convert to FileResponse and add thumbnail URLs
+        rows = result.all()
+
+        if count_in_query:
+            total = rows[0].total_count if rows else 0
+            if cache_version is not None:
+                await cache_file_count(current_user.id, cache_version, search, total)
+        if total is not None:
+            total_pages = (total + page_size - 1) // page_size
+
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = None
+        if has_next:
+            last = rows[-1]
+            next_cursor = encode_cursor(last.uploaded_at, last.id)
+
+        # Rows come straight from typed columns, so skip validation
         file_responses = []
-        for f in files:
-            response = FileResponse.from_orm(f)
-            response = await add_thumbnail_url(response)
-            file_responses.append(response)
-
-        return FileListResponse(
+        url_expiry = {}
+        for row in rows:
+            values = row._asdict()
+            values.pop("total_count", None)
+            url_expiry[row.id] = values.pop("thumbnail_url_expires_at")
+            file_responses.append(FileResponse.model_construct(**values))
+
+        # Use stored thumbnail URLs, re-signing expiring ones in one batch
+        await fill_thumbnail_urls(file_responses, url_expiry, background_tasks)
+
+        # Every field is built here from trusted values; skip validation
+        file_list = FileListResponse.model_construct(
             items=file_responses,
-            total=total,
-            page=page,
+            next_cursor=next_cursor,
+            has_next=has_next,
             page_size=page_size,
+            total=total,
             total_pages=total_pages
         )
 
+        # Serialize once, in pydantic-core, for both the cache and the
+        # response. Returning the model would have FastAPI dump it, validate
+        # it again against response_model and only then encode it.
+        payload = file_list.model_dump_json()
+        if list_cache_key is not None:
+            await cache_file_list(list_cache_key, payload)
+        return Response(content=payload, media_type="application/json")
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing files: {e}")
         raise HTTPException(
@@ -246,17 +654,15 @@ async def list_files(
 @router.get("/{file_id}", response_model=FileResponse)
 async def get_file(
     file_id: str,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get file details"""
     try:
         result = await db.execute(
-            select(FileModel).where(
-                FileModel.id == file_id,
-                FileModel.user_id == current_user.id,
-                FileModel.is_deleted == False
-            )
+            _owned_file_query,
+            {"file_id": file_id, "user_id": current_user.id}
         )
         file_record = result.scalar_one_or_none()
 
@@ -266,8 +672,13 @@ async def get_file(
                 detail="File not found"
             )
 
-        response = FileResponse.from_orm(file_record)
-        return await add_thumbnail_url(response)
+        response = FileResponse.model_validate(file_record)
+        await fill_thumbnail_urls(
+            [response],
+            {file_record.id: file_record.thumbnail_url_expires_at},
+            background_tasks
+        )
+        return response
 
     except HTTPException:
         raise
@@ -285,14 +696,17 @@ async def download_file(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get presigned URL for file download"""
+    """
+    Download a file
+
+    Files up to DOWNLOAD_PROXY_MAX_SIZE are streamed back directly, saving
+    the client a second round trip to MinIO. Larger files are redirected
+    (307) to a presigned URL so their bytes don't pass through the API.
+    """
     try:
         result = await db.execute(
-            select(FileModel).where(
-                FileModel.id == file_id,
-                FileModel.user_id == current_user.id,
-                FileModel.is_deleted == False
-            )
+            _owned_file_query,
+            {"file_id": file_id, "user_id": current_user.id}
         )
         file_record = result.scalar_one_or_none()
 
@@ -302,14 +716,28 @@ async def download_file(
                 detail="File not found"
             )
 
-        # Generate presigned URL
-        url = await storage_service.get_presigned_url(file_record.file_path)
+        if file_record.file_size < settings.DOWNLOAD_PROXY_MAX_SIZE:
+            stream = await storage_service.get_stream(file_record.file_path)
+            return StreamingResponse(
+                stream,
+                media_type=file_record.mime_type or "application/octet-stream",
+                headers={
+                    "Content-Disposition": f"inline; filename*=UTF-8''{quote(file_record.final_filename)}"
+                }
+            )
 
-        return {
-            "download_url": url,
-            "filename": file_record.final_filename,
-            "expires_in": 3600  # 1 hour
-        }
+        # Redirect to a presigned URL. Blobs are shared by content hash, so
+        # the download filename is signed into the URL itself.
+        url = await storage_service.get_presigned_url(
+            file_record.file_path,
+            download_filename=file_record.final_filename
+        )
+
+        return RedirectResponse(
+            url=url,
+            status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+            headers={"Cache-Control": f"private, max-age={DOWNLOAD_REDIRECT_MAX_AGE}"}
+        )
 
     except HTTPException:
         raise
@@ -325,18 +753,39 @@ async def download_file(
 async def update_file(
     file_id: str,
     file_update: FileUpdate,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update file metadata"""
     try:
-        result = await db.execute(
-            select(FileModel).where(
-                FileModel.id == file_id,
-                FileModel.user_id == current_user.id,
-                FileModel.is_deleted == False
+        values = {}
+        if file_update.final_filename:
+            values['final_filename'] = sanitize_filename(file_update.final_filename)
+
+        if file_update.summary:
+            values['summary'] = file_update.summary
+
+        if file_update.ai_tags:
+            values['ai_tags'] = file_update.ai_tags
+
+        if values:
+            # Update and read back the new row in one statement
+            result = await db.execute(
+                update(FileModel)
+                .where(
+                    FileModel.id == file_id,
+                    FileModel.user_id == current_user.id,
+                    FileModel.is_deleted == False
+                )
+                .values(**values)
+                .returning(FileModel)
+            )
+        else:
+            result = await db.execute(
+                _owned_file_query,
+                {"file_id": file_id, "user_id": current_user.id}
             )
-        )
         file_record = result.scalar_one_or_none()
 
         if not file_record:
@@ -345,22 +794,25 @@ async def update_file(
                 detail="File not found"
             )
 
-        # Update fields
-        if file_update.final_filename:
-            file_record.final_filename = sanitize_filename(file_update.final_filename)
-
-        if file_update.summary:
-            file_record.summary = file_update.summary
-
         if file_update.ai_tags:
-            file_record.ai_tags = file_update.ai_tags
+            # Keep the normalized tags in step; the user set these
+            for statement in build_replace_file_tags(
+                file_record.id, file_update.ai_tags, user_confirmed=True
+            ):
+                await db.execute(statement)
 
         await db.commit()
-        await db.refresh(file_record)
+        await invalidate_file_list_cache(current_user.id)
 
         logger.info(f"File updated: {file_id}")
 
-        return FileResponse.from_orm(file_record)
+        response = FileResponse.model_validate(file_record)
+        await fill_thumbnail_urls(
+            [response],
+            {file_record.id: file_record.thumbnail_url_expires_at},
+            background_tasks
+        )
+        return response
 
     except HTTPException:
         raise
@@ -380,24 +832,27 @@ async def delete_file(
 ):
     """Soft delete file"""
     try:
+        # Soft delete, checking ownership in the same statement
         result = await db.execute(
-            select(FileModel).where(
+            update(FileModel)
+            .where(
                 FileModel.id == file_id,
                 FileModel.user_id == current_user.id,
                 FileModel.is_deleted == False
             )
+            .values(is_deleted=True)
+            .returning(FileModel.id)
         )
-        file_record = result.scalar_one_or_none()
+        deleted_id = result.scalar_one_or_none()
 
-        if not file_record:
+        if deleted_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="File not found"
             )
 
-        # Soft delete
-        file_record.is_deleted = True
         await db.commit()
+        await invalidate_file_list_cache(current_user.id)
 
         logger.info(f"File deleted: {file_id}")
 
@@ -425,11 +880,8 @@ async def get_file_processing_status(
     """
     try:
         result = await db.execute(
-            select(FileModel).where(
-                FileModel.id == file_id,
-                FileModel.user_id == current_user.id,
-                FileModel.is_deleted == False
-            )
+            _owned_file_query,
+            {"file_id": file_id, "user_id": current_user.id}
         )
         file_record = result.scalar_one_or_none()
 
@@ -470,11 +922,8 @@ async def reprocess_file_endpoint(
     """
     try:
         result = await db.execute(
-            select(FileModel).where(
-                FileModel.id == file_id,
-                FileModel.user_id == current_user.id,
-                FileModel.is_deleted == False
-            )
+            _owned_file_query,
+            {"file_id": file_id, "user_id": current_user.id}
         )
         file_record = result.scalar_one_or_none()
 
@@ -491,6 +940,7 @@ async def reprocess_file_endpoint(
             file_id=str(file_record.id),
             user_id=str(current_user.id)
         )
+        await invalidate_file_list_cache(current_user.id)
 
         logger.info(f"Reprocessing task dispatched: task_id={task.id}, file_id={file_id}")
 
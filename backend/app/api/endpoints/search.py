@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, values, column, Integer
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from pydantic import TypeAdapter
 from typing import List
+from uuid import UUID
 import logging
 
 from app.core.database import get_db
 from app.core.security import get_current_user
-from app.models.database import User, File as FileModel
+from app.api.endpoints.files import fill_thumbnail_urls
+from app.models.database import User, File as FileModel, Tag, FileTag
 from app.schemas.file import FileResponse
+from app.utils.file_utils import escape_like
 from app.services.ai_service import ai_service
 from app.services.vector_service import vector_service
 
@@ -15,9 +21,12 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+_files_adapter = TypeAdapter(List[FileResponse])
+
 
 @router.post("/semantic", response_model=List[FileResponse])
 async def semantic_search(
+    background_tasks: BackgroundTasks,
     query: str = Query(..., min_length=1),
     limit: int = Query(10, ge=1, le=50),
     db: AsyncSession = Depends(get_db),
@@ -28,8 +37,8 @@ async def semantic_search(
     Search files by meaning, not just keywords
     """
     try:
-        # Generate embedding for search query
-        query_embedding = await ai_service.generate_embedding(query)
+        # Generate (or reuse a cached) embedding for the search query
+        query_embedding = await ai_service.generate_query_embedding(query)
 
         # Search in Qdrant
         similar_results = await vector_service.search_similar(
@@ -42,30 +51,42 @@ async def semantic_search(
         if not similar_results:
             return []
 
-        # Get file IDs
-        file_ids = [result['file_id'] for result in similar_results]
-
-        # Get files from database
+        # Get file IDs in score order. A file can have several points
+        # (e.g. after reprocessing), so keep only its best-scoring hit.
+        file_ids = list(dict.fromkeys(result['file_id'] for result in similar_results))
+
+        # Get files from database, joined to (id, rank) VALUES so Postgres
+        # returns them in Qdrant's score order
+        ranked = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("rank", Integer),
+            name="ranked"
+        ).data([(UUID(file_id), rank) for rank, file_id in enumerate(file_ids)])
         result = await db.execute(
-            select(FileModel).where(
-                FileModel.id.in_(file_ids),
+            select(FileModel)
+            .join(ranked, FileModel.id == ranked.c.id)
+            .where(
                 FileModel.user_id == current_user.id,
                 FileModel.is_deleted == False
             )
+            .order_by(ranked.c.rank)
         )
         files = result.scalars().all()
 
-        # Sort by score (match order from Qdrant)
-        file_dict = {str(f.id): f for f in files}
-        sorted_files = []
-        for similar in similar_results:
-            file_id = similar['file_id']
-            if file_id in file_dict:
-                sorted_files.append(file_dict[file_id])
-
-        logger.info(f"Semantic search: '{query}' found {len(sorted_files)} results")
+        logger.info(f"Semantic search: '{query}' found {len(files)} results")
 
-        return [FileResponse.from_orm(f) for f in sorted_files]
+        # Validate and encode once here; returning the models would make
+        # FastAPI re-validate them against response_model before encoding
+        file_responses = _files_adapter.validate_python(files)
+        await fill_thumbnail_urls(
+            file_responses,
+            {file.id: file.thumbnail_url_expires_at for file in files},
+            background_tasks
+        )
+        return Response(
+            content=_files_adapter.dump_json(file_responses),
+            media_type="application/json"
+        )
 
     except Exception as e:
         logger.error(f"Error in semantic search: {e}")
@@ -75,39 +96,93 @@ async def semantic_search(
         )
 
 
-@router.get("/suggest-tags")
-async def suggest_tags(
+@router.get("/keyword", response_model=List[FileResponse])
+async def keyword_search(
+    background_tasks: BackgroundTasks,
     query: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get tag suggestions based on query
+    Full-text search over filenames, summaries and AI tags
+
+    Matches use the GIN-indexed search_vector; results are ranked with
+    filename matches above summary matches above tag matches.
     """
     try:
-        # Get all unique tags from user's files
+        ts_query = func.plainto_tsquery('english', query)
         result = await db.execute(
-            select(FileModel.ai_tags).where(
+            select(FileModel)
+            .where(
                 FileModel.user_id == current_user.id,
                 FileModel.is_deleted == False,
-                FileModel.ai_tags.isnot(None)
+                FileModel.search_vector.op('@@')(ts_query)
             )
+            .order_by(
+                func.ts_rank(FileModel.search_vector, ts_query).desc(),
+                FileModel.uploaded_at.desc()
+            )
+            .limit(limit)
         )
+        files = result.scalars().all()
+
+        logger.info(f"Keyword search: '{query}' found {len(files)} results")
 
-        all_tags = set()
-        for row in result.scalars():
-            if row:
-                all_tags.update(row)
+        file_responses = _files_adapter.validate_python(files)
+        await fill_thumbnail_urls(
+            file_responses,
+            {file.id: file.thumbnail_url_expires_at for file in files},
+            background_tasks
+        )
+        return Response(
+            content=_files_adapter.dump_json(file_responses),
+            media_type="application/json"
+        )
 
-        # Filter tags that match query
-        query_lower = query.lower()
-        matching_tags = [
-            tag for tag in all_tags
-            if query_lower in tag.lower()
-        ]
+    except Exception as e:
+        logger.error(f"Error in keyword search: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Search failed"
+        )
+
+
+@router.get("/suggest-tags")
+async def suggest_tags(
+    query: str = Query(..., min_length=1),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get tag suggestions based on query
+    """
+    try:
+        # Match tag names first, then keep those on one of the user's live
+        # files: the probe walks file_tags (tag_id, file_id) per tag instead
+        # of unnesting every file's JSON tags
+        user_has_tag = (
+            select(FileTag.file_id)
+            .join(FileModel, FileModel.id == FileTag.file_id)
+            .where(
+                FileTag.tag_id == Tag.id,
+                FileModel.user_id == current_user.id,
+                FileModel.is_deleted == False
+            )
+            .exists()
+        )
+        result = await db.execute(
+            select(Tag.name)
+            .where(
+                Tag.name.ilike(f"%{escape_like(query)}%", escape="/"),
+                user_has_tag
+            )
+            .order_by(Tag.name)
+            .limit(10)
+        )
 
         return {
-            "tags": sorted(matching_tags)[:10]
+            "tags": result.scalars().all()
         }
 
     except Exception as e:
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Request, HTTPException, status, Header, Depends
-from linebot import LineBotApi, WebhookHandler
+from starlette.concurrency import run_in_threadpool
+from linebot import WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import (
     MessageEvent,
@@ -10,73 +11,30 @@ from linebot.models import (
     TextMessage
 )
 import logging
-import magic
 from sqlalchemy.orm import Session
 from sqlalchemy import select, desc, func
-from typing import Optional
-from datetime import datetime, timedelta
-import io
+from typing import Dict
+from urllib.parse import parse_qsl
+from uuid import UUID
+from datetime import datetime, timedelta, timezone
 
 from app.core.config import settings
-from app.core.security import verify_line_signature
-from app.core.database import SessionLocal
-from app.models.database import User as UserModel, File as FileModel
+from app.core.database import session_scope
+from app.models.database import File as FileModel
 from app.services.line_service import line_service
-from app.services.storage_service import storage_service
+from app.services.user_service import get_or_create_line_user_id_sync
 from app.templates.flex_messages import flex_templates
-from app.workers.tasks.file_processing import process_uploaded_file
+from app.utils.file_utils import escape_like
+from app.workers.tasks.line_ingest import ingest_line_content
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize LINE Bot API
-line_bot_api = LineBotApi(settings.LINE_CHANNEL_ACCESS_TOKEN)
+# Initialize LINE webhook handler; LINE API calls go through line_service
 handler = WebhookHandler(settings.LINE_CHANNEL_SECRET)
 
 
-def get_db():
-    """Get database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-async def get_or_create_user(line_user_id: str, db: Session) -> Optional[UserModel]:
-    """Get or create user from LINE ID"""
-    try:
-        # Check if user exists
-        result = db.execute(
-            select(UserModel).where(UserModel.line_user_id == line_user_id)
-        )
-        user = result.scalar_one_or_none()
-
-        if not user:
-            # Get profile from LINE
-            profile = line_service.get_user_profile(line_user_id)
-            if not profile:
-                return None
-
-            # Create new user
-            user = UserModel(
-                line_user_id=line_user_id,
-                display_name=profile['display_name'],
-                picture_url=profile.get('picture_url')
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            logger.info(f"Created new user: {line_user_id}")
-
-        return user
-
-    except Exception as e:
-        logger.error(f"Error getting/creating user: {e}")
-        return None
-
-
 @router.post("/line")
 async def line_webhook(
     request: Request,
@@ -97,14 +55,14 @@ async def line_webhook(
                 detail="Missing signature"
             )
 
-        if not verify_line_signature(body, x_line_signature):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid signature"
-            )
-
-        # Handle webhook
-        handler.handle(body.decode('utf-8'), x_line_signature)
+        # Handle webhook. handler.handle verifies the signature itself and
+        # raises InvalidSignatureError, so there is no separate check here.
+        # The event handlers are sync and make blocking LINE, Redis and
+        # database calls, so run them in a worker thread to keep the event
+        # loop free for concurrent webhooks. Starlette's threadpool is used
+        # rather than asyncio's default executor, which upload hashing and
+        # MinIO transfers can keep busy.
+        await run_in_threadpool(handler.handle, body.decode('utf-8'), x_line_signature)
 
         return {"status": "ok"}
 
@@ -121,232 +79,48 @@ async def line_webhook(
         )
 
 
-@handler.add(MessageEvent, message=FileMessage)
-def handle_file_message(event):
-    """Handle file messages from LINE"""
-    try:
-        logger.info(f"Received file message: {event.message.id}")
-
-        db = SessionLocal()
-        try:
-            # Get or create user
-            user = get_or_create_user_sync(event.source.user_id, db)
-            if not user:
-                line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถระบุผู้ใช้ได้")
-                return
-
-            # Download file from LINE
-            file_content = line_service.download_content(event.message.id)
-            if not file_content:
-                line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถดาวน์โหลดไฟล์ได้")
-                return
-
-            # Get file info
-            filename = event.message.file_name
-            file_size = event.message.file_size
-
-            # Detect MIME type
-            mime_type = magic.from_buffer(file_content, mime=True)
-
-            # Upload to MinIO
-            file_hash = storage_service.generate_file_hash(file_content)
-            object_name = f"uploads/{user.id}/{file_hash}/{filename}"
-
-            file_io = io.BytesIO(file_content)
-            storage_service.upload_file_sync(
-                file_data=file_io,
-                object_name=object_name,
-                content_type=mime_type
-            )
-
-            # Create file record
-            file_record = FileModel(
-                user_id=user.id,
-                original_filename=filename,
-                final_filename=filename,
-                file_path=object_name,
-                file_size=file_size,
-                mime_type=mime_type,
-                file_hash=file_hash,
-                processing_status='pending'
-            )
-            db.add(file_record)
-            db.commit()
-            db.refresh(file_record)
-
-            # Send confirmation with Flex Message
-            flex_content = flex_templates.file_upload_confirmation(
-                filename=filename,
-                file_size=file_size,
-                file_type=mime_type,
-                file_id=str(file_record.id)
-            )
-            line_service.reply_flex(
-                event.reply_token,
-                alt_text=f"อัปโหลด {filename} สำเร็จ",
-                flex_content=flex_content
-            )
-
-            # Start background processing
-            process_uploaded_file.delay(str(file_record.id), str(user.id))
+# Replies for media messages by message type: (received, failed)
+MEDIA_REPLIES = {
+    "file": ("📥 ได้รับไฟล์ {filename} แล้ว กำลังอัปโหลด...", "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดไฟล์"),
+    "image": ("📥 ได้รับรูปภาพแล้ว กำลังอัปโหลด...", "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดรูปภาพ"),
+    "video": ("📥 ได้รับวิดีโอแล้ว กำลังอัปโหลด...", "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดวิดีโอ"),
+}
 
-            logger.info(f"File uploaded and queued for processing: {file_record.id}")
 
-        finally:
-            db.close()
-
-    except Exception as e:
-        logger.error(f"Error handling file message: {e}")
-        line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดไฟล์")
-
-
-@handler.add(MessageEvent, message=ImageMessage)
-def handle_image_message(event):
-    """Handle image messages from LINE"""
+@handler.add(MessageEvent, message=[FileMessage, ImageMessage, VideoMessage])
+def handle_media_message(event):
+    """Handle file, image and video messages from LINE"""
+    kind = event.message.type
+    received_text, failed_text = MEDIA_REPLIES[kind]
     try:
-        logger.info(f"Received image message: {event.message.id}")
-
-        db = SessionLocal()
-        try:
-            user = get_or_create_user_sync(event.source.user_id, db)
-            if not user:
-                line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถระบุผู้ใช้ได้")
-                return
-
-            # Download image
-            file_content = line_service.download_content(event.message.id)
-            if not file_content:
-                line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถดาวน์โหลดรูปภาพได้")
-                return
-
-            # Detect MIME type and extension
-            mime_type = magic.from_buffer(file_content, mime=True)
-            ext = mime_type.split('/')[-1] if '/' in mime_type else 'jpg'
-            filename = f"image_{event.message.id}.{ext}"
-            file_size = len(file_content)
-
-            # Upload to MinIO
-            file_hash = storage_service.generate_file_hash(file_content)
-            object_name = f"uploads/{user.id}/{file_hash}/{filename}"
-
-            file_io = io.BytesIO(file_content)
-            storage_service.upload_file_sync(
-                file_data=file_io,
-                object_name=object_name,
-                content_type=mime_type
-            )
-
-            # Create file record
-            file_record = FileModel(
-                user_id=user.id,
-                original_filename=filename,
-                final_filename=filename,
-                file_path=object_name,
-                file_size=file_size,
-                mime_type=mime_type,
-                file_hash=file_hash,
-                processing_status='pending'
-            )
-            db.add(file_record)
-            db.commit()
-            db.refresh(file_record)
-
-            # Send confirmation
-            flex_content = flex_templates.file_upload_confirmation(
-                filename=filename,
-                file_size=file_size,
-                file_type=mime_type,
-                file_id=str(file_record.id)
-            )
-            line_service.reply_flex(
-                event.reply_token,
-                alt_text=f"อัปโหลดรูปภาพสำเร็จ",
-                flex_content=flex_content
-            )
-
-            # Start processing
-            process_uploaded_file.delay(str(file_record.id), str(user.id))
-
-        finally:
-            db.close()
+        logger.info(f"Received {kind} message: {event.message.id}")
+
+        # Only file messages carry a name; the worker names images/videos
+        filename = getattr(event.message, "file_name", None)
+
+        # Download, storage and the DB insert run in the worker; the result
+        # is pushed to the user from there
+        ingest_line_content.delay(
+            event.message.id,
+            event.source.user_id,
+            kind,
+            filename=filename
+        )
+        line_service.reply_text(event.reply_token, received_text.format(filename=filename))
 
     except Exception as e:
-        logger.error(f"Error handling image message: {e}")
-        line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดรูปภาพ")
+        logger.error(f"Error handling {kind} message: {e}")
+        line_service.reply_text(event.reply_token, failed_text)
 
-
-@handler.add(MessageEvent, message=VideoMessage)
-def handle_video_message(event):
-    """Handle video messages from LINE"""
-    try:
-        logger.info(f"Received video message: {event.message.id}")
-
-        db = SessionLocal()
-        try:
-            user = get_or_create_user_sync(event.source.user_id, db)
-            if not user:
-                line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถระบุผู้ใช้ได้")
-                return
-
-            # Download video
-            file_content = line_service.download_content(event.message.id)
-            if not file_content:
-                line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถดาวน์โหลดวิดีโอได้")
-                return
-
-            mime_type = magic.from_buffer(file_content, mime=True)
-            ext = mime_type.split('/')[-1] if '/' in mime_type else 'mp4'
-            filename = f"video_{event.message.id}.{ext}"
-            file_size = len(file_content)
-
-            # Upload to MinIO
-            file_hash = storage_service.generate_file_hash(file_content)
-            object_name = f"uploads/{user.id}/{file_hash}/{filename}"
-
-            file_io = io.BytesIO(file_content)
-            storage_service.upload_file_sync(
-                file_data=file_io,
-                object_name=object_name,
-                content_type=mime_type
-            )
-
-            # Create file record
-            file_record = FileModel(
-                user_id=user.id,
-                original_filename=filename,
-                final_filename=filename,
-                file_path=object_name,
-                file_size=file_size,
-                mime_type=mime_type,
-                file_hash=file_hash,
-                processing_status='pending'
-            )
-            db.add(file_record)
-            db.commit()
-            db.refresh(file_record)
-
-            # Send confirmation
-            flex_content = flex_templates.file_upload_confirmation(
-                filename=filename,
-                file_size=file_size,
-                file_type=mime_type,
-                file_id=str(file_record.id)
-            )
-            line_service.reply_flex(
-                event.reply_token,
-                alt_text=f"อัปโหลดวิดีโอสำเร็จ",
-                flex_content=flex_content
-            )
-
-            # Start processing
-            process_uploaded_file.delay(str(file_record.id), str(user.id))
-
-        finally:
-            db.close()
-
-    except Exception as e:
-        logger.error(f"Error handling video message: {e}")
-        line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดวิดีโอ")
+# Static replies, built once at import rather than on every message
+HELP_FLEX = flex_templates.help_menu()
+WELCOME_TEXT = "สวัสดีค่ะ! 👋\n\n📤 ส่งไฟล์/รูปภาพ/วิดีโอมาได้เลย\n💡 หรือใช้คำสั่งด้านล่างเพื่อจัดการไฟล์"
+WELCOME_QUICK_REPLY = line_service.create_quick_reply([
+    {'label': '🔍 ค้นหา', 'text': '/search'},
+    {'label': '📋 รายการไฟล์', 'text': '/list'},
+    {'label': '📊 สถิติ', 'text': '/stats'},
+    {'label': 'ℹ️ ช่วยเหลือ', 'text': '/help'}
+])
 
 
 @handler.add(MessageEvent, message=TextMessage)
@@ -356,44 +130,48 @@ def handle_text_message(event):
         user_message = event.message.text.strip()
         logger.info(f"Received text message: {user_message}")
 
-        db = SessionLocal()
-        try:
-            user = get_or_create_user_sync(event.source.user_id, db)
-            if not user:
+        with session_scope() as db:
+            user_id = get_or_create_line_user_id_sync(event.source.user_id, db)
+            if not user_id:
                 line_service.reply_text(event.reply_token, "ขออภัย ไม่สามารถระบุผู้ใช้ได้")
                 return
 
-            # Handle commands
-            if user_message.startswith("/search"):
-                handle_search_command(event, user, db)
-            elif user_message == "/list":
-                handle_list_command(event, user, db)
-            elif user_message == "/stats":
-                handle_stats_command(event, user, db)
-            elif user_message == "/help" or user_message == "help":
-                handle_help_command(event)
+            # Handle commands, looked up by the first word of the message
+            command = TEXT_COMMANDS.get(user_message.partition(" ")[0])
+            if command:
+                command(event, user_id, db)
             else:
                 # Default welcome message with quick reply
-                quick_reply = line_service.create_quick_reply([
-                    {'label': '🔍 ค้นหา', 'text': '/search'},
-                    {'label': '📋 รายการไฟล์', 'text': '/list'},
-                    {'label': '📊 สถิติ', 'text': '/stats'},
-                    {'label': 'ℹ️ ช่วยเหลือ', 'text': '/help'}
-                ])
                 line_service.reply_text(
                     event.reply_token,
-                    "สวัสดีค่ะ! 👋\n\n📤 ส่งไฟล์/รูปภาพ/วิดีโอมาได้เลย\n💡 หรือใช้คำสั่งด้านล่างเพื่อจัดการไฟล์",
-                    quick_reply=quick_reply
+                    WELCOME_TEXT,
+                    quick_reply=WELCOME_QUICK_REPLY
                 )
 
-        finally:
-            db.close()
-
     except Exception as e:
         logger.error(f"Error handling text message: {e}")
         line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาด")
 
 
+def handle_share_postback(event, data: Dict[str, str]):
+    """Handle the share button"""
+    line_service.reply_text(
+        event.reply_token,
+        f"ฟีเจอร์แชร์ไฟล์กำลังพัฒนา\nFile ID: {data.get('file_id')}"
+    )
+
+
+def handle_unknown_postback(event, data: Dict[str, str]):
+    """Handle postbacks with a missing or unknown action"""
+    line_service.reply_text(event.reply_token, "ไม่รู้จักคำสั่งนี้")
+
+
+# Postback handlers by the "action" field of the postback data
+POSTBACK_ACTIONS = {
+    "share": handle_share_postback,
+}
+
+
 @handler.add(PostbackEvent)
 def handle_postback(event):
     """Handle postback events (button clicks)"""
@@ -401,19 +179,11 @@ def handle_postback(event):
         postback_data = event.postback.data
         logger.info(f"Received postback: {postback_data}")
 
-        # Parse postback data
-        data_dict = dict(item.split('=') for item in postback_data.split('&'))
+        # Parse postback data (a URL-encoded query string)
+        data = dict(parse_qsl(postback_data, keep_blank_values=True))
 
-        action = data_dict.get('action')
-
-        if action == 'share':
-            file_id = data_dict.get('file_id')
-            line_service.reply_text(
-                event.reply_token,
-                f"ฟีเจอร์แชร์ไฟล์กำลังพัฒนา\nFile ID: {file_id}"
-            )
-        else:
-            line_service.reply_text(event.reply_token, "ไม่รู้จักคำสั่งนี้")
+        action_handler = POSTBACK_ACTIONS.get(data.get('action'), handle_unknown_postback)
+        action_handler(event, data)
 
     except Exception as e:
         logger.error(f"Error handling postback: {e}")
@@ -421,7 +191,7 @@ def handle_postback(event):
 
 # Command handlers
 
-def handle_search_command(event, user: UserModel, db: Session):
+def handle_search_command(event, user_id: UUID, db: Session):
     """Handle /search command"""
     try:
         query = event.message.text.replace("/search", "").strip()
@@ -433,19 +203,19 @@ def handle_search_command(event, user: UserModel, db: Session):
             )
             return
 
-        # Search files (simple text search for now)
+        # Search files on search_text (lowercased filenames + summary), which
+        # has a pg_trgm GIN index, so LIKE '%q%' doesn't scan every file
         result = db.execute(
-            select(FileModel)
+            select(FileModel.id, FileModel.final_filename, FileModel.summary)
             .where(
-                FileModel.user_id == user.id,
+                FileModel.user_id == user_id,
                 FileModel.is_deleted == False,
-                (FileModel.final_filename.ilike(f"%{query}%") |
-                 FileModel.summary.ilike(f"%{query}%"))
+                FileModel.search_text.like(f"%{escape_like(query.lower())}%", escape="/")
             )
             .order_by(desc(FileModel.uploaded_at))
             .limit(10)
         )
-        files = result.scalars().all()
+        files = result.all()
 
         # Convert to dict
         file_dicts = [
@@ -474,14 +244,14 @@ def handle_search_command(event, user: UserModel, db: Session):
         line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาดในการค้นหา")
 
 
-def handle_list_command(event, user: UserModel, db: Session):
+def handle_list_command(event, user_id: UUID, db: Session):
     """Handle /list command"""
     try:
         # Get recent files
         result = db.execute(
             select(FileModel)
             .where(
-                FileModel.user_id == user.id,
+                FileModel.user_id == user_id,
                 FileModel.is_deleted == False
             )
             .order_by(desc(FileModel.uploaded_at))
@@ -511,51 +281,40 @@ def handle_list_command(event, user: UserModel, db: Session):
         line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาดในการดึงรายการไฟล์")
 
 
-def handle_stats_command(event, user: UserModel, db: Session):
+def handle_stats_command(event, user_id: UUID, db: Session):
     """Handle /stats command"""
     try:
-        # Get statistics
-        total_files = db.execute(
-            select(func.count(FileModel.id))
-            .where(
-                FileModel.user_id == user.id,
-                FileModel.is_deleted == False
+        # Totals and recent uploads in one pass over the user's files
+        seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        totals = db.execute(
+            select(
+                func.count(FileModel.id).label('total_files'),
+                func.coalesce(func.sum(FileModel.file_size), 0).label('total_size'),
+                func.count(FileModel.id).filter(FileModel.uploaded_at >= seven_days_ago).label('recent_uploads')
             )
-        ).scalar()
-
-        total_size = db.execute(
-            select(func.sum(FileModel.file_size))
             .where(
-                FileModel.user_id == user.id,
+                FileModel.user_id == user_id,
                 FileModel.is_deleted == False
             )
-        ).scalar() or 0
+        ).one()
+        total_files = totals.total_files
+        total_size = totals.total_size
+        recent_uploads = totals.recent_uploads
 
         # Files by type
         type_result = db.execute(
             select(
-                func.substring(FileModel.mime_type, 1, func.position('/' in FileModel.mime_type) - 1).label('type'),
-                func.count(FileModel.id).label('count')
+                FileModel.mime_family.label('type'),
+                func.count().label('count')
             )
             .where(
-                FileModel.user_id == user.id,
+                FileModel.user_id == user_id,
                 FileModel.is_deleted == False
             )
-            .group_by('type')
+            .group_by(FileModel.mime_family)
         )
         by_type = {row.type: row.count for row in type_result}
 
-        # Recent uploads (last 7 days)
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_uploads = db.execute(
-            select(func.count(FileModel.id))
-            .where(
-                FileModel.user_id == user.id,
-                FileModel.is_deleted == False,
-                FileModel.uploaded_at >= seven_days_ago
-            )
-        ).scalar()
-
         # Send Flex Message
         flex_content = flex_templates.statistics(
             total_files=total_files or 0,
@@ -574,46 +333,24 @@ def handle_stats_command(event, user: UserModel, db: Session):
         line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาดในการดึงสถิติ")
 
 
-def handle_help_command(event):
+def handle_help_command(event, user_id: UUID, db: Session):
     """Handle /help command"""
     try:
-        flex_content = flex_templates.help_menu()
         line_service.reply_flex(
             event.reply_token,
             alt_text="คำสั่งที่ใช้ได้",
-            flex_content=flex_content
+            flex_content=HELP_FLEX
         )
     except Exception as e:
         logger.error(f"Error in help command: {e}")
         line_service.reply_text(event.reply_token, "ขออภัย เกิดข้อผิดพลาด")
 
 
-# Helper function for sync user creation
-def get_or_create_user_sync(line_user_id: str, db: Session) -> Optional[UserModel]:
-    """Synchronous version of get_or_create_user for webhook handlers"""
-    try:
-        result = db.execute(
-            select(UserModel).where(UserModel.line_user_id == line_user_id)
-        )
-        user = result.scalar_one_or_none()
-
-        if not user:
-            profile = line_service.get_user_profile(line_user_id)
-            if not profile:
-                return None
-
-            user = UserModel(
-                line_user_id=line_user_id,
-                display_name=profile['display_name'],
-                picture_url=profile.get('picture_url')
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            logger.info(f"Created new user: {line_user_id}")
-
-        return user
-
-    except Exception as e:
-        logger.error(f"Error getting/creating user: {e}")
-        return None
+# Text command handlers by the first word of the message
+TEXT_COMMANDS = {
+    "/search": handle_search_command,
+    "/list": handle_list_command,
+    "/stats": handle_stats_command,
+    "/help": handle_help_command,
+    "help": handle_help_command,
+}
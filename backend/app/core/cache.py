@@ -0,0 +1,92 @@
+"""
+Redis cache clients
+
+The async client is shared by request-path caches (e.g. the authenticated
+user lookup) and initialized in app startup. The sync client serves the
+LINE webhook handler threads and Celery tasks and is created on first use.
+Callers must treat a missing client or a Redis error as a cache miss.
+"""
+
+import logging
+import threading
+from typing import Optional
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Singleton client (will be initialized in app startup)
+cache_client: Optional[aioredis.Redis] = None
+
+# Singleton sync client (created on first use)
+sync_cache_client: Optional[redis.Redis] = None
+_sync_cache_lock = threading.Lock()
+
+
+async def initialize_cache() -> None:
+    """Create the async Redis connection pool and verify connectivity"""
+    global cache_client
+    client = aioredis.from_url(
+        settings.REDIS_URL,
+        db=settings.REDIS_CACHE_DB,
+        decode_responses=True
+    )
+    await client.ping()
+    cache_client = client
+    logger.info("Async Redis cache initialized")
+
+
+async def close_cache() -> None:
+    """Close the async Redis connection pool"""
+    global cache_client
+    if cache_client is not None:
+        await cache_client.close()
+        cache_client = None
+
+
+def get_cache() -> Optional[aioredis.Redis]:
+    """Get global async Redis client instance"""
+    return cache_client
+
+
+def get_sync_cache() -> Optional[redis.Redis]:
+    """Get global sync Redis client instance, or None if it can't be created"""
+    global sync_cache_client
+    if sync_cache_client is None:
+        with _sync_cache_lock:
+            if sync_cache_client is None:
+                try:
+                    sync_cache_client = redis.Redis.from_url(
+                        settings.REDIS_URL,
+                        db=settings.REDIS_CACHE_DB,
+                        decode_responses=True
+                    )
+                except Exception as e:
+                    logger.warning(f"Error creating sync Redis cache client: {e}")
+                    return None
+    return sync_cache_client
+
+
+def file_list_version_key(user_id) -> str:
+    """Key of the version counter that a user's cached file list pages and counts are keyed on"""
+    return f"files:list_ver:{user_id}"
+
+
+def invalidate_file_list_cache_sync(user_id) -> None:
+    """
+    Invalidate a user's cached file list pages and counts
+
+    For Celery tasks, which change files outside the API; the API
+    invalidates through its async client.
+    """
+    cache = get_sync_cache()
+    if cache is None:
+        return
+
+    try:
+        cache.incr(file_list_version_key(user_id))
+    except Exception as e:
+        logger.warning(f"Error invalidating file list cache: {e}")
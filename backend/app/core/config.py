@@ -17,12 +17,29 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     DATABASE_POOL_SIZE: int = 20
-    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_MAX_OVERFLOW: int = 40
+    DATABASE_POOL_TIMEOUT: int = 30
+    DATABASE_POOL_RECYCLE: int = 1800  # 30 minutes
+    # The sync engine only serves webhook threads and Celery tasks, which run
+    # one task per process, so it needs far fewer connections
+    DATABASE_SYNC_POOL_SIZE: int = 5
+    DATABASE_SYNC_MAX_OVERFLOW: int = 5
+    DATABASE_POOL_PRE_PING: bool = False  # ping on every checkout; pool_recycle retires stale connections
+    DATABASE_USE_PGBOUNCER: bool = False  # PgBouncer in transaction mode pools for us
+    DATABASE_QUERY_CACHE_SIZE: int = 1200  # compiled SQL statements cached per engine
+    # SQLAlchemy's asyncpg prepared statements cached per connection; forced
+    # to 0 with DATABASE_USE_PGBOUNCER
+    DATABASE_STATEMENT_CACHE_SIZE: int = 500
+    SQL_ECHO: bool = False  # log every SQL statement; independent of DEBUG
 
     # Redis
     REDIS_URL: str
     REDIS_CACHE_DB: int = 0
     REDIS_CELERY_DB: int = 1
+    USER_CACHE_TTL: int = 300  # 5 minutes
+    LINE_USER_CACHE_TTL: int = 3600  # LINE user ID -> user ID, which never changes
+    FILE_COUNT_CACHE_TTL: int = 30  # list_files include_total
+    FILE_LIST_CACHE_TTL: int = 30  # list_files pages, dropped on writes
 
     # Celery
     CELERY_BROKER_URL: str
@@ -32,6 +49,8 @@ class Settings(BaseSettings):
     QDRANT_URL: str
     QDRANT_COLLECTION_NAME: str = "drive2_files"
     QDRANT_VECTOR_SIZE: int = 768
+    QDRANT_PREFER_GRPC: bool = True  # gRPC over one HTTP/2 connection instead of REST
+    QDRANT_GRPC_PORT: int = 6334
 
     # MinIO
     MINIO_ENDPOINT: str
@@ -39,16 +58,25 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str
     MINIO_BUCKET_NAME: str = "drive2-files"
     MINIO_SECURE: bool = False
+    PRESIGNED_URL_CACHE_SIZE: int = 10000  # per process
+    THUMBNAIL_URL_EXPIRES: int = 86400  # persisted thumbnail URLs, seconds (MinIO max is 7 days)
 
     # LINE
     LINE_CHANNEL_SECRET: str
     LINE_CHANNEL_ACCESS_TOKEN: str
     LINE_LIFF_ID: str
+    LINE_PROFILE_CACHE_SIZE: int = 10000  # per process
+    LINE_PROFILE_CACHE_TTL: int = 7200  # 2 hours
+    # Register LINE users without fetching their profile; LIFF login fills in
+    # the display name and picture later
+    LINE_SKIP_GET_USER_PROFILE: bool = False
 
     # Gemini AI
     GEMINI_API_KEY: str
     GEMINI_MODEL: str = "gemini-2.0-flash-exp"
     GEMINI_EMBEDDING_MODEL: str = "models/text-embedding-004"
+    QUERY_EMBEDDING_CACHE_TTL: int = 3600  # semantic search query embeddings
+    AI_RESULT_CACHE_TTL: int = 2592000  # 30 days; file analysis by content
 
     # Security
     SECRET_KEY: str
@@ -58,6 +86,7 @@ class Settings(BaseSettings):
 
     # File Processing
     MAX_FILE_SIZE: int = 52428800  # 50MB
+    DOWNLOAD_PROXY_MAX_SIZE: int = 1048576  # 1MB; smaller files stream through the API
     ALLOWED_EXTENSIONS: str = "pdf,doc,docx,txt,jpg,jpeg,png,gif,mp4,zip"
     THUMBNAIL_SIZE: int = 300
     OCR_LANGUAGE: str = "eng+tha"
@@ -65,6 +94,7 @@ class Settings(BaseSettings):
     # Rate Limiting
     GEMINI_RPM_LIMIT: int = 15
     GEMINI_DAILY_LIMIT: int = 1500
+    GEMINI_CONCURRENCY: int = 4  # concurrent Gemini calls per process
 
     class Config:
         env_file = ".env"
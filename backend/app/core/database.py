@@ -1,15 +1,59 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy.pool import NullPool
+from contextlib import contextmanager
+from typing import Iterator
+from uuid import uuid4
 from app.core.config import settings
 
+# Pool settings for each engine. Pools connect lazily, so a process only
+# holds connections for the engine it actually uses.
+if settings.DATABASE_USE_PGBOUNCER:
+    # PgBouncer multiplexes server connections, so don't hold a second pool
+    # here. Transaction pooling also breaks prepared statement caching: turn
+    # off both asyncpg's and SQLAlchemy's, and give every statement SQLAlchemy
+    # still prepares a unique name so two clients sharing a server connection
+    # can't collide on one.
+    async_pool_kwargs = {
+        "poolclass": NullPool,
+        "connect_args": {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        },
+    }
+    sync_pool_kwargs = {"poolclass": NullPool}
+else:
+    shared_pool_kwargs = {
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+    async_pool_kwargs = {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        # Prepared statements SQLAlchemy's asyncpg adapter keeps per
+        # connection, so repeated queries skip parse and plan. Every
+        # statement is parameterized (LIKE patterns included), so they all
+        # qualify. The PgBouncer branch above turns this cache off.
+        "connect_args": {
+            "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        },
+        **shared_pool_kwargs,
+    }
+    sync_pool_kwargs = {
+        "pool_size": settings.DATABASE_SYNC_POOL_SIZE,
+        "max_overflow": settings.DATABASE_SYNC_MAX_OVERFLOW,
+        **shared_pool_kwargs,
+    }
+
 # Create async engine
 engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True,
+    echo=settings.SQL_ECHO,
+    query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+    **async_pool_kwargs,
 )
 
 # Create sync engine for Celery tasks
@@ -17,10 +61,9 @@ engine = create_async_engine(
 sync_database_url = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
 sync_engine = create_engine(
     sync_database_url,
-    echo=settings.DEBUG,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True,
+    echo=settings.SQL_ECHO,
+    query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+    **sync_pool_kwargs,
 )
 
 # Session factory (async)
@@ -37,6 +80,24 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Sync session for one unit of work
+
+    Commits on success, rolls back on error and always returns the
+    connection to the pool.
+    """
+    with SessionLocal() as session:
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
 # Base class for models
 Base = declarative_base()
 
@@ -1,15 +1,26 @@
 from datetime import datetime, timedelta
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import time
 from typing import Optional
-from jose import JWTError, jwt
+import jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, bindparam
 
 from app.core.config import settings
+from app.core.cache import get_cache
 from app.core.database import get_db
 from app.models.database import User
+from app.schemas.user import UserResponse
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -17,6 +28,17 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Bearer token
 security = HTTPBearer()
 
+# User lookup run by every authenticated request on a cache miss. Built once
+# so each call only binds the id and hits the compiled-statement cache.
+_user_by_id_query = select(User).where(User.id == bindparam("user_id"))
+
+# Verified token payloads, per process
+TOKEN_CACHE_TTL = 30
+_token_cache = TTLCache(maxsize=8192, ttl=TOKEN_CACHE_TTL)
+
+# LINE channel secret as the HMAC key, encoded once
+_line_channel_secret = settings.LINE_CHANNEL_SECRET.encode('utf-8')
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
@@ -32,11 +54,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 def verify_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
+    """
+    Verify JWT token and return payload
+
+    Clients send the same token on every request, so verified payloads are
+    kept for up to TOKEN_CACHE_TTL seconds, never past the token's expiry.
+    """
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            algorithms=[settings.ALGORITHM],
+            options={"require": ["exp"]}
+        )
+        ttl = min(TOKEN_CACHE_TTL, payload["exp"] - time.time())
+        if ttl > 0:
+            _token_cache.set(token, payload, ttl=ttl)
         return payload
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -59,8 +98,13 @@ async def get_current_user(
             detail="Could not validate credentials"
         )
 
+    # Try the Redis cache first
+    user = await get_cached_user(user_id)
+    if user is not None:
+        return user
+
     # Get user from database
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(_user_by_id_query, {"user_id": user_id})
     user = result.scalar_one_or_none()
 
     if user is None:
@@ -69,21 +113,70 @@ async def get_current_user(
             detail="User not found"
         )
 
+    await cache_user(user)
+
     return user
 
 
+def _user_cache_key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+async def get_cached_user(user_id: str) -> Optional[User]:
+    """
+    Get a detached User from the Redis cache
+
+    Returns None on a miss or if Redis is unavailable.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    try:
+        raw = await cache.get(_user_cache_key(user_id))
+        if raw is None:
+            return None
+        return User(**UserResponse.model_validate_json(raw).model_dump())
+    except Exception as e:
+        logger.warning(f"Error reading user cache: {e}")
+        return None
+
+
+async def cache_user(user: User) -> None:
+    """Store a user in the Redis cache for USER_CACHE_TTL seconds"""
+    cache = get_cache()
+    if cache is None:
+        return
+
+    try:
+        await cache.setex(
+            _user_cache_key(user.id),
+            settings.USER_CACHE_TTL,
+            UserResponse.model_validate(user).model_dump_json()
+        )
+    except Exception as e:
+        logger.warning(f"Error writing user cache: {e}")
+
+
+async def invalidate_cached_user(user_id) -> None:
+    """Drop a user from the Redis cache after it changes"""
+    cache = get_cache()
+    if cache is None:
+        return
+
+    try:
+        await cache.delete(_user_cache_key(user_id))
+    except Exception as e:
+        logger.warning(f"Error invalidating user cache: {e}")
+
+
 def verify_line_signature(body: bytes, signature: str) -> bool:
     """Verify LINE webhook signature"""
-    import hmac
-    import hashlib
-    import base64
-
-    hash_digest = hmac.new(
-        settings.LINE_CHANNEL_SECRET.encode('utf-8'),
-        body,
-        hashlib.sha256
-    ).digest()
+    try:
+        expected = base64.b64decode(signature, validate=True)
+    except (binascii.Error, ValueError):
+        return False
 
-    calculated_signature = base64.b64encode(hash_digest).decode('utf-8')
+    hash_digest = hmac.new(_line_channel_secret, body, hashlib.sha256).digest()
 
-    return hmac.compare_digest(signature, calculated_signature)
+    return hmac.compare_digest(hash_digest, expected)
@@ -1,32 +1,48 @@
-from sqlalchemy import Column, String, BigInteger, Boolean, Integer, Float, Text, ForeignKey, JSON, DateTime
-from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-import uuid
+from sqlalchemy import Column, String, BigInteger, Boolean, Integer, Float, Text, ForeignKey, DateTime, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR, ARRAY, REAL, JSONB, ENUM
+from sqlalchemy.orm import relationship, backref, deferred
+from sqlalchemy.sql import func, text
 
 from app.core.database import Base
 
 
+# File processing lifecycle. A native enum is stored in 4 bytes and gives
+# the planner exact per-value statistics.
+processing_status_enum = ENUM(
+    'pending',
+    'processing',
+    'completed',
+    'failed',
+    name='processing_status_t'
+)
+
+
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     line_user_id = Column(String(255), unique=True, nullable=False, index=True)
     display_name = Column(String(255))
     picture_url = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Fetch server-generated created_at/updated_at via RETURNING on both
+    # INSERT and UPDATE, so no refresh is needed after commit
+    __mapper_args__ = {"eager_defaults": True}
+
     # Relationships
-    files = relationship("File", back_populates="user", cascade="all, delete-orphan")
-    collections = relationship("Collection", back_populates="user", cascade="all, delete-orphan")
-    activity_logs = relationship("ActivityLog", back_populates="user", cascade="all, delete-orphan")
+    # lazy="raise": async sessions can't lazy-load, and no response needs these.
+    # Use selectinload() explicitly; deletes rely on the FK ON DELETE CASCADE.
+    files = relationship("File", back_populates="user", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    collections = relationship("Collection", back_populates="user", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    activity_logs = relationship("ActivityLog", back_populates="user", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
 
 class File(Base):
     __tablename__ = "files"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     # File Info
@@ -36,20 +52,25 @@ class File(Base):
     file_path = Column(String(1000), nullable=False)
     file_size = Column(BigInteger, nullable=False)
     mime_type = Column(String(100))
-    file_hash = Column(String(64), unique=True, index=True)
+    # Top-level MIME type ("image" for "image/png"), for per-type stats
+    mime_family = Column(String(100), Computed("split_part(mime_type, '/', 1)", persisted=True))
+    file_hash = Column(String(64), index=True)
     thumbnail_path = Column(String(1000))  # Path to thumbnail in MinIO
+    # Presigned thumbnail URL, stored so reads don't re-sign it every time
+    thumbnail_url = Column(Text)
+    thumbnail_url_expires_at = Column(DateTime(timezone=True))
 
     # AI Analysis
     summary = Column(Text)
-    ai_tags = Column(JSON)  # ["education", "english", "ielts"]
-    file_metadata = Column(JSON)  # {page_count, dimensions, etc}
+    ai_tags = Column(JSONB)  # ["education", "english", "ielts"]
+    file_metadata = Column(JSONB)  # {page_count, dimensions, etc}
 
     # Version Control
     version = Column(Integer, default=1)
     parent_file_id = Column(UUID(as_uuid=True), ForeignKey("files.id"))
 
     # Status
-    processing_status = Column(String(50), default='pending')  # pending, processing, completed, failed
+    processing_status = Column(processing_status_enum, default='pending')
     is_deleted = Column(Boolean, default=False)
 
     # Timestamps
@@ -58,25 +79,98 @@ class File(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    # Full-text search
-    search_vector = Column(TSVECTOR)
+    # Search columns are only ever used in WHERE / ORDER BY, so they are
+    # deferred: loading a File never fetches them, and reading one on an
+    # instance raises rather than lazy loading.
+
+    # Full-text search over filename (A), summary (B) and AI tags (C),
+    # kept in sync by Postgres
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(final_filename, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(ai_tags::text, '')), 'C')",
+        persisted=True
+    )), raiseload=True)
+    # Lowercased filename + summary haystack for trigram (LIKE '%q%') search.
+    # Stored lowercased so queries match with LIKE on a lowercased needle
+    # instead of ILIKE lowercasing every row on recheck.
+    search_text = deferred(Column(Text, Computed(
+        "lower(coalesce(original_filename, '') || ' ' || "
+        "coalesce(final_filename, '') || ' ' || "
+        "coalesce(summary, ''))",
+        persisted=True
+    )), raiseload=True)
 
     # Relationships
-    user = relationship("User", back_populates="files")
-    tags = relationship("FileTag", back_populates="file", cascade="all, delete-orphan")
-    embeddings = relationship("FileEmbedding", back_populates="file", cascade="all, delete-orphan")
-    parent = relationship("File", remote_side=[id], backref="versions")
+    # lazy="raise": FileResponse is built from columns only (thumbnail_path
+    # included), so serializing a file must never trigger per-row lazy loads.
+    # Use selectinload() explicitly when a relationship is actually needed.
+    user = relationship("User", back_populates="files", lazy="raise")
+    tags = relationship("FileTag", back_populates="file", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    embeddings = relationship("FileEmbedding", back_populates="file", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    parent = relationship("File", remote_side=[id], backref=backref("versions", lazy="raise"), lazy="raise")
+
+    __table_args__ = (
+        # Keyset pagination for file listing: (uploaded_at, id) < cursor.
+        # Partial, since listings only ever read live files.
+        Index(
+            "ix_files_user_uploaded_active",
+            "user_id",
+            uploaded_at.desc(),
+            id.desc(),
+            postgresql_where=(is_deleted == False),
+        ),
+        # Files still being processed (stuck-file cleanup); stays tiny
+        # because completed and failed files drop out of it
+        Index(
+            "ix_files_processing_status",
+            "processing_status",
+            "uploaded_at",
+            postgresql_where=processing_status.in_(['pending', 'processing']),
+        ),
+        # One live copy of a given content hash per user (upload dedup)
+        Index(
+            "uq_files_user_file_hash_active",
+            "user_id",
+            "file_hash",
+            unique=True,
+            postgresql_where=(is_deleted == False),
+        ),
+        # Per-type file counts (/stats) as an index-only scan
+        Index(
+            "ix_files_user_mime_family",
+            "user_id",
+            "mime_family",
+            postgresql_where=(is_deleted == False),
+        ),
+        # Full-text (@@) search on filename, summary and tags
+        Index(
+            "ix_files_search_vector_gin",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=(is_deleted == False),
+        ),
+        # Trigram index so LIKE '%q%' on search_text avoids a sequential scan
+        Index(
+            "ix_files_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+            postgresql_where=(is_deleted == False),
+        ),
+    )
 
 
 class Tag(Base):
     __tablename__ = "tags"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     name = Column(String(100), unique=True, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
-    file_tags = relationship("FileTag", back_populates="tag", cascade="all, delete-orphan")
+    # A tag can be on any number of files; never load them implicitly
+    file_tags = relationship("FileTag", back_populates="tag", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
 
 class FileTag(Base):
@@ -89,14 +183,27 @@ class FileTag(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
-    file = relationship("File", back_populates="tags")
-    tag = relationship("Tag", back_populates="file_tags")
+    # A file tag is only useful with its name, so the tag row is always
+    # joined in: selectinload(File.tags) then costs one query per page of
+    # files, not one more per tag
+    file = relationship("File", back_populates="tags", lazy="raise")
+    tag = relationship("Tag", back_populates="file_tags", lazy="joined", innerjoin=True)
+
+    __table_args__ = (
+        # Files by tag; the primary key (file_id, tag_id) covers tags by file
+        Index(
+            "ix_file_tags_tag_file",
+            "tag_id",
+            "file_id",
+            postgresql_include=["confidence_score"],
+        ),
+    )
 
 
 class Collection(Base):
     __tablename__ = "collections"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
     description = Column(Text)
@@ -114,7 +221,7 @@ class CollectionFile(Base):
     __tablename__ = "collection_files"
 
     collection_id = Column(UUID(as_uuid=True), ForeignKey("collections.id", ondelete="CASCADE"), primary_key=True)
-    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True, index=True)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -125,7 +232,7 @@ class CollectionFile(Base):
 class CollectionShare(Base):
     __tablename__ = "collection_shares"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     collection_id = Column(UUID(as_uuid=True), ForeignKey("collections.id", ondelete="CASCADE"), nullable=False)
     shared_with_user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     permission = Column(String(20), default='view')  # view, edit, admin
@@ -139,9 +246,11 @@ class CollectionShare(Base):
 class FileEmbedding(Base):
     __tablename__ = "file_embeddings"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), nullable=False, index=True)
-    embedding_vector = Column(JSON)  # Store as JSON, actual vectors in Qdrant
+    # Packed float32 (real[]): about a fifth of the size of a JSON number list.
+    # Similarity search runs in Qdrant, which holds the indexed copy.
+    embedding_vector = Column(ARRAY(REAL))
     chunk_text = Column(Text)
     chunk_index = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -153,13 +262,21 @@ class FileEmbedding(Base):
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="SET NULL"))
     action = Column(String(50), nullable=False)  # upload, rename, delete, share, search
-    details = Column(JSON)
+    details = Column(JSONB)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     # Relationships
     user = relationship("User", back_populates="activity_logs")
     file = relationship("File")
+
+
+# Extensions required by the indexes above (for Base.metadata.create_all)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from uuid import UUID
@@ -50,16 +50,16 @@ class FileResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FileListResponse(BaseModel):
     items: List[FileResponse]
-    total: int
-    page: int
+    next_cursor: Optional[str] = None
+    has_next: bool = False
     page_size: int
-    total_pages: int
+    total: Optional[int] = None
+    total_pages: Optional[int] = None
 
 
 class FileUploadResponse(BaseModel):
@@ -1,10 +1,16 @@
 import google.generativeai as genai
 from typing import List, Dict, Optional
+import asyncio
+import base64
+import hashlib
 import logging
+import struct
+import threading
 from tenacity import retry, stop_after_attempt, wait_exponential
-import json
+import orjson
 
 from app.core.config import settings
+from app.core.cache import get_cache, get_sync_cache
 from app.utils.rate_limiter import get_rate_limiter, get_quota_tracker
 from app.services.ollama_service import ollama_service
 
@@ -13,145 +19,337 @@ logger = logging.getLogger(__name__)
 # Configure Gemini
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+# Leading characters of the content sent for filename/summary/tags analysis
+ANALYSIS_CONTENT_CHARS = 5000
+
+# Leading characters of the content sent for the document embedding. The
+# embedding model only reads its first 2048 tokens and truncates the rest
+# server-side, so sending whole documents only adds upload time; this
+# leaves headroom over 2048 tokens even for token-dense (e.g. Thai) text.
+EMBEDDING_CONTENT_CHARS = 10000
+
+# Built once; only the filename and content excerpt are filled in per call
+_ANALYSIS_PROMPT = """\
+You are a file naming and content categorization expert. Analyze the file below.
+
+Original filename: {original_filename}
+File content (excerpt): {content}
+
+Return ONLY a JSON object with these fields:
+- "filename": a clear, descriptive filename for this file.
+  Use underscores or hyphens instead of spaces, keep it under 50
+  characters and include file type context if relevant
+  (e.g., resume, invoice, report).
+- "summary": 2-3 concise sentences on the main purpose, key points
+  and important information.
+- "tags": 3-5 tags describing subject matter (e.g., education,
+  business, personal), document type (e.g., invoice, resume,
+  report, notes), topics (e.g., programming, finance, health)
+  and any other relevant categories, each with a confidence.
+
+Example:
+{{
+    "filename": "ielts_writing_task_notes",
+    "summary": "Notes on IELTS writing task structure ...",
+    "tags": [
+        {{"tag": "education", "confidence": 0.95}},
+        {{"tag": "english", "confidence": 0.90}},
+        {{"tag": "ielts", "confidence": 0.85}}
+    ]
+}}
+
+Important: Return ONLY the JSON object, no explanations or other text.
+"""
+
 
 class AIService:
     def __init__(self):
         self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
         self.embedding_model = settings.GEMINI_EMBEDDING_MODEL
+        # In-flight query embeddings, so concurrent identical searches share one call
+        self._pending_query_embeddings: Dict[str, asyncio.Task] = {}
+        # Caps concurrent Gemini calls per process. A thread semaphore rather
+        # than an asyncio one: Celery runs each task on a fresh event loop,
+        # and the calls themselves run in worker threads.
+        self._gemini_slots = threading.BoundedSemaphore(settings.GEMINI_CONCURRENCY)
+
+    def _call_gemini_blocking(self, fn, *args, **kwargs):
+        with self._gemini_slots:
+            return fn(*args, **kwargs)
+
+    async def _call_gemini(self, fn, *args, **kwargs):
+        """
+        Run a blocking Gemini SDK call in a worker thread
+
+        The SDK calls are synchronous; running them off the event loop is
+        what lets analyze_file overlap them, and keeps query embeddings
+        from stalling the API.
+        """
+        return await asyncio.to_thread(self._call_gemini_blocking, fn, *args, **kwargs)
+
+    @staticmethod
+    def _parse_json_response(text: str):
+        """Parse JSON from a model response, tolerating a markdown code fence"""
+        # The pinned SDK can't request a JSON response, so the model may
+        # still wrap it in ```json ... ```. Slice out the fenced body once
+        # instead of splitting the whole response.
+        fence = text.find("```")
+        if fence != -1:
+            body_start = text.find("\n", fence) + 1
+            body_end = text.find("```", body_start)
+            text = text[body_start:body_end if body_end != -1 else None]
+        return orjson.loads(text)
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    async def generate_filename(self, content: str, original_filename: str) -> str:
-        """Generate smart filename based on content"""
-        try:
-            prompt = f"""
-            You are a file naming expert. Based on the file content below, suggest a clear,
-            descriptive filename that accurately represents what the file is about.
+    async def analyze_all(self, content: str, filename: str) -> Dict[str, any]:
+        """
+        Generate filename, summary and tags in a single Gemini call
+
+        One prompt asks for all three as a JSON object, so the document is
+        sent and tokenized once instead of three times. A field that is
+        missing from the object falls back to a default; a failed call or
+        a response that isn't JSON raises, so analyze_file can fall back to
+        Ollama and never caches a degraded result.
+
+        Args:
+            content: Extracted file content
+            filename: Original filename
+
+        Returns:
+            Dict with suggested_filename, summary and tags
+        """
+        result = {
+            'suggested_filename': filename,
+            'summary': "Unable to generate summary",
+            'tags': [{"tag": "document", "confidence": 0.5}]
+        }
 
-            Original filename: {original_filename}
-            File content (excerpt): {content[:2000]}
+        try:
+            prompt = _ANALYSIS_PROMPT.format(
+                original_filename=filename,
+                content=content[:ANALYSIS_CONTENT_CHARS]
+            )
 
-            Rules:
-            - Use clear, descriptive names
-            - Use underscores or hyphens instead of spaces
-            - Keep it under 50 characters
-            - Include file type context if relevant (e.g., resume, invoice, report)
-            - Only return the filename, nothing else
+            response = await self._call_gemini(self.model.generate_content, prompt)
+            analysis = self._parse_json_response(response.text)
 
-            Suggested filename:
-            """
+            suggested_filename = str(analysis.get('filename') or "").strip()
+            if suggested_filename:
+                # Clean the filename
+                result['suggested_filename'] = suggested_filename.replace(" ", "_").replace("/", "-")
 
-            response = self.model.generate_content(prompt)
-            filename = response.text.strip()
+            summary = str(analysis.get('summary') or "").strip()
+            if summary:
+                result['summary'] = summary
 
-            # Clean the filename
-            filename = filename.replace(" ", "_").replace("/", "-")
+            tags = analysis.get('tags')
+            if isinstance(tags, list) and tags:
+                result['tags'] = tags
 
-            logger.info(f"Generated filename: {filename}")
-            return filename
+            logger.info(
+                f"Generated filename: {result['suggested_filename']}, "
+                f"{len(result['tags'])} tags"
+            )
 
         except Exception as e:
-            logger.error(f"Error generating filename: {e}")
-            # Fallback to original filename
-            return original_filename
+            logger.error(f"Error analyzing content: {e}")
+            raise
+
+        return result
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    async def summarize_content(self, content: str) -> str:
-        """Summarize file content"""
+    async def generate_embedding(self, text: str) -> List[float]:
+        """Generate embedding vector for semantic search"""
         try:
-            prompt = f"""
-            Summarize the following document content in 2-3 concise sentences.
-            Focus on the main purpose, key points, and important information.
+            result = await self._call_gemini(
+                genai.embed_content,
+                model=self.embedding_model,
+                content=text,
+                task_type="retrieval_document"
+            )
+
+            embedding = result['embedding']
+            logger.info(f"Generated embedding of size {len(embedding)}")
+            return embedding
+
+        except Exception as e:
+            logger.error(f"Error generating embedding: {e}")
+            raise
 
-            Content: {content[:5000]}
+    async def generate_query_embedding(self, query: str) -> List[float]:
+        """
+        Generate embedding for a search query, cached by normalized text
+
+        Queries are lowercased and whitespace-collapsed, then looked up in
+        Redis. On a miss, concurrent callers with the same query share a
+        single embedding call.
+
+        Args:
+            query: Raw search query
+
+        Returns:
+            Embedding vector
+        """
+        normalized = " ".join(query.lower().split())
+        query_digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        cache_key = f"query_emb:{self.embedding_model}:{query_digest}"
 
-            Summary:
-            """
+        embedding = await self._get_cached_embedding(cache_key)
+        if embedding is not None:
+            return embedding
+
+        task = self._pending_query_embeddings.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._embed_query(normalized, cache_key))
+            self._pending_query_embeddings[cache_key] = task
+            task.add_done_callback(lambda _: self._pending_query_embeddings.pop(cache_key, None))
+
+        # Shield so one cancelled request doesn't cancel the shared call
+        return await asyncio.shield(task)
 
-            response = self.model.generate_content(prompt)
-            summary = response.text.strip()
+    async def _embed_query(self, normalized: str, cache_key: str) -> List[float]:
+        embedding = await self.generate_embedding(normalized)
+        await self._cache_embedding(cache_key, embedding)
+        return embedding
 
-            logger.info(f"Generated summary: {summary[:100]}...")
-            return summary
+    @staticmethod
+    async def _get_cached_embedding(cache_key: str) -> Optional[List[float]]:
+        cache = get_cache()
+        if cache is None:
+            return None
 
+        try:
+            raw = await cache.get(cache_key)
+            if raw is None:
+                return None
+            packed = base64.b64decode(raw)
+            return list(struct.unpack(f"<{len(packed) // 2}e", packed))
         except Exception as e:
-            logger.error(f"Error summarizing content: {e}")
-            return "Unable to generate summary"
+            logger.warning(f"Error reading query embedding cache: {e}")
+            return None
+
+    @staticmethod
+    async def _cache_embedding(cache_key: str, embedding: List[float]) -> None:
+        cache = get_cache()
+        if cache is None:
+            return
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    async def generate_tags(self, content: str, filename: str) -> List[Dict[str, any]]:
-        """Generate relevant tags for the file"""
         try:
-            prompt = f"""
-            You are a content categorization expert. Analyze the following file and generate 3-5 relevant tags.
+            # float16 halves the payload; the precision loss doesn't move
+            # cosine similarity enough to matter for ranking
+            packed = struct.pack(f"<{len(embedding)}e", *embedding)
+            await cache.setex(
+                cache_key,
+                settings.QUERY_EMBEDDING_CACHE_TTL,
+                base64.b64encode(packed).decode('ascii')
+            )
+        except Exception as e:
+            logger.warning(f"Error writing query embedding cache: {e}")
 
-            Filename: {filename}
-            Content (excerpt): {content[:3000]}
+    @staticmethod
+    def _analysis_cache_key(content: str) -> str:
+        # blake2b is cheaper than sha256 for a cache key; the models are part
+        # of the key so switching either one never serves stale results
+        content_digest = hashlib.blake2b(content.encode('utf-8'), digest_size=20).hexdigest()
+        return f"ai_result:{settings.GEMINI_MODEL}:{settings.GEMINI_EMBEDDING_MODEL}:{content_digest}"
 
-            Generate tags that describe:
-            - Subject matter (e.g., education, business, personal)
-            - Document type (e.g., invoice, resume, report, notes)
-            - Topics (e.g., programming, finance, health)
-            - Any other relevant categories
+    @staticmethod
+    def _get_cached_analysis(cache_key: str) -> Optional[Dict[str, any]]:
+        cache = get_sync_cache()
+        if cache is None:
+            return None
 
-            Return ONLY a JSON array of objects with this format:
-            [
-                {{"tag": "education", "confidence": 0.95}},
-                {{"tag": "english", "confidence": 0.90}},
-                {{"tag": "ielts", "confidence": 0.85}}
-            ]
+        try:
+            raw = cache.get(cache_key)
+            if raw is None:
+                return None
+            result = orjson.loads(raw)
+            packed = base64.b64decode(result['embedding'])
+            result['embedding'] = list(struct.unpack(f"<{len(packed) // 4}f", packed))
+            return result
+        except Exception as e:
+            logger.warning(f"Error reading AI result cache: {e}")
+            return None
 
-            Important: Return ONLY the JSON array, no explanations or other text.
-            """
+    @staticmethod
+    def _cache_analysis(cache_key: str, result: Dict[str, any]) -> None:
+        cache = get_sync_cache()
+        if cache is None:
+            return
 
-            response = self.model.generate_content(prompt)
-            tags_text = response.text.strip()
+        try:
+            # Embeddings are stored as packed float32 (what Qdrant keeps),
+            # a quarter of the size of the JSON float list
+            embedding = result['embedding']
+            packed = struct.pack(f"<{len(embedding)}f", *embedding)
+            cache.setex(
+                cache_key,
+                settings.AI_RESULT_CACHE_TTL,
+                orjson.dumps({**result, 'embedding': base64.b64encode(packed).decode('ascii')})
+            )
+        except Exception as e:
+            logger.warning(f"Error writing AI result cache: {e}")
 
-            # Clean response (remove markdown code blocks if present)
-            if "```json" in tags_text:
-                tags_text = tags_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in tags_text:
-                tags_text = tags_text.split("```")[1].split("```")[0].strip()
+    @staticmethod
+    def _file_analysis_key(file_hash: str) -> str:
+        return f"ai_result_ref:{file_hash}"
 
-            # Parse JSON
-            tags = json.loads(tags_text)
+    def link_file_analysis(self, file_hash: str, content: str) -> None:
+        """
+        Point a file hash at the cached analysis of its extracted text
 
-            logger.info(f"Generated {len(tags)} tags")
-            return tags
+        Lets later uploads of the same bytes find the analysis without
+        downloading and extracting the file again.
 
-        except Exception as e:
-            logger.error(f"Error generating tags: {e}")
-            # Fallback tags
-            return [{"tag": "document", "confidence": 0.5}]
+        Args:
+            file_hash: sha256 of the file content
+            content: Text extracted from the file, as passed to analyze_file
+        """
+        cache = get_sync_cache()
+        if cache is None:
+            return
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    async def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding vector for semantic search"""
         try:
-            result = genai.embed_content(
-                model=self.embedding_model,
-                content=text,
-                task_type="retrieval_document"
+            cache.setex(
+                self._file_analysis_key(file_hash),
+                settings.AI_RESULT_CACHE_TTL,
+                self._analysis_cache_key(content)
             )
+        except Exception as e:
+            logger.warning(f"Error writing AI result reference: {e}")
 
-            embedding = result['embedding']
-            logger.info(f"Generated embedding of size {len(embedding)}")
-            return embedding
+    def get_cached_analysis_for_file(self, file_hash: str) -> Optional[Dict[str, any]]:
+        """
+        Get the cached analysis of a file's content by file hash
+
+        Only Gemini output is ever cached, never user edits, so the result
+        is safe to apply to any file with the same content.
 
+        Args:
+            file_hash: sha256 of the file content
+
+        Returns:
+            Result as returned by analyze_file, or None on a miss
+        """
+        cache = get_sync_cache()
+        if cache is None:
+            return None
+
+        try:
+            cache_key = cache.get(self._file_analysis_key(file_hash))
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            raise
+            logger.warning(f"Error reading AI result reference: {e}")
+            return None
+
+        if not cache_key:
+            return None
+        return self._get_cached_analysis(cache_key)
 
     async def analyze_file(
         self,
@@ -161,6 +359,10 @@ class AIService:
         """
         Complete AI analysis of a file with rate limiting and fallback support
 
+        Gemini results are cached by content for AI_RESULT_CACHE_TTL, so
+        duplicate uploads and reprocessing don't pay for the same analysis
+        twice. Cache hits skip the rate limiter and quota entirely.
+
         Returns: {
             'suggested_filename': str,
             'summary': str,
@@ -172,6 +374,13 @@ class AIService:
         use_ollama = False
         model_used = 'gemini'
 
+        # Runs in Celery workers, where only the sync Redis client exists
+        cache_key = self._analysis_cache_key(content)
+        cached = await asyncio.to_thread(self._get_cached_analysis, cache_key)
+        if cached is not None:
+            logger.info(f"[Gemini] Using cached AI analysis for: {filename}")
+            return cached
+
         try:
             # Check rate limiter
             rate_limiter = get_rate_limiter()
@@ -213,16 +422,17 @@ class AIService:
                     logger.info(f"Gemini usage: {usage.get('daily_count')}/{usage.get('daily_limit')} daily, "
                               f"{usage.get('rpm_count')}/{usage.get('rpm_limit')} rpm")
 
-                # Run all AI tasks with Gemini
-                suggested_filename = await self.generate_filename(content, filename)
-                summary = await self.summarize_content(content)
-                tags = await self.generate_tags(content, filename)
-                embedding = await self.generate_embedding(content)
+                # Filename, summary and tags come from one call; the embedding
+                # uses a different model endpoint. The two are independent,
+                # so they run concurrently; any exception falls through to
+                # Ollama below.
+                analysis, embedding = await asyncio.gather(
+                    self.analyze_all(content, filename),
+                    self.generate_embedding(content[:EMBEDDING_CONTENT_CHARS])
+                )
 
                 result = {
-                    'suggested_filename': suggested_filename,
-                    'summary': summary,
-                    'tags': tags,
+                    **analysis,
                     'embedding': embedding,
                     'model_used': model_used
                 }
@@ -231,6 +441,10 @@ class AIService:
                 if quota_tracker:
                     quota_tracker.log_request(success=True, model='gemini')
 
+                # Ollama fallbacks are never cached, so a later run can
+                # still get a Gemini result
+                await asyncio.to_thread(self._cache_analysis, cache_key, result)
+
                 logger.info(f"[Gemini] AI analysis completed for: {filename}")
                 return result
 
@@ -10,8 +10,11 @@ Includes:
 
 import logging
 import httpx
-from typing import Optional, Dict, List, Any
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, List, Any, Iterator
 from linebot import LineBotApi
+from linebot.http_client import HttpClient, RequestsHttpClient, RequestsHttpResponse
 from linebot.models import (
     TextSendMessage,
     FlexSendMessage,
@@ -21,73 +24,128 @@ from linebot.models import (
     PostbackAction,
     ImageSendMessage
 )
-import io
 
 from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Pooled connections to the LINE API per process. Webhook handlers run on
+# Starlette's threadpool (40 threads by default), so keep that many alive.
+LINE_HTTP_POOL_SIZE = 40
+
+
+class PooledRequestsHttpClient(RequestsHttpClient):
+    """
+    RequestsHttpClient that sends every call over one requests.Session
+
+    The SDK's client calls requests.get/post directly, which opens a new
+    TCP + TLS connection to the LINE API for every reply, push, profile
+    and content request. A shared session keeps them alive and reuses them.
+    """
+
+    def __init__(self, timeout=HttpClient.DEFAULT_TIMEOUT):
+        super().__init__(timeout)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=LINE_HTTP_POOL_SIZE))
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        response = self.session.get(
+            url, headers=headers, params=params, stream=stream, timeout=timeout
+        )
+        return RequestsHttpResponse(response)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        response = self.session.post(url, headers=headers, data=data, timeout=timeout)
+        return RequestsHttpResponse(response)
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        response = self.session.delete(url, headers=headers, data=data, timeout=timeout)
+        return RequestsHttpResponse(response)
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        response = self.session.put(url, headers=headers, data=data, timeout=timeout)
+        return RequestsHttpResponse(response)
+
 
 class LineService:
     """Service for LINE Bot operations"""
 
     def __init__(self):
-        self.bot_api = LineBotApi(settings.LINE_CHANNEL_ACCESS_TOKEN)
+        self.bot_api = LineBotApi(
+            settings.LINE_CHANNEL_ACCESS_TOKEN,
+            http_client=PooledRequestsHttpClient
+        )
         self.channel_secret = settings.LINE_CHANNEL_SECRET
+        self._profile_cache = TTLCache(
+            maxsize=settings.LINE_PROFILE_CACHE_SIZE,
+            ttl=settings.LINE_PROFILE_CACHE_TTL
+        )
 
-    async def download_content(self, message_id: str) -> Optional[bytes]:
+    def stream_content(self, message_id: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
         """
-        Download file content from LINE CDN
+        Stream file content from LINE CDN without buffering it whole
 
         Args:
             message_id: LINE message ID containing the file
+            chunk_size: Bytes per chunk
 
         Returns:
-            File bytes or None if failed
+            Iterator over the content in chunks; raises on LINE API errors
         """
-        try:
-            # Get message content from LINE
-            message_content = self.bot_api.get_message_content(message_id)
-
-            # Read content as bytes
-            content_bytes = io.BytesIO()
-            for chunk in message_content.iter_content():
-                content_bytes.write(chunk)
-
-            content_bytes.seek(0)
-            file_data = content_bytes.getvalue()
-
-            logger.info(f"Downloaded {len(file_data)} bytes from LINE message {message_id}")
-            return file_data
-
-        except Exception as e:
-            logger.error(f"Error downloading content from LINE: {e}")
-            return None
+        message_content = self.bot_api.get_message_content(message_id)
+        return message_content.iter_content(chunk_size)
 
     def get_user_profile(self, user_id: str) -> Optional[Dict]:
         """
         Get LINE user profile
 
+        Profiles are cached in-process for LINE_PROFILE_CACHE_TTL seconds,
+        so repeat lookups for the same user skip the LINE API.
+
         Args:
             user_id: LINE user ID
 
         Returns:
             User profile dict or None
         """
+        cached = self._profile_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
+
         try:
             profile = self.bot_api.get_profile(user_id)
 
-            return {
+            result = {
                 'user_id': profile.user_id,
                 'display_name': profile.display_name,
                 'picture_url': profile.picture_url,
                 'status_message': getattr(profile, 'status_message', None)
             }
+            self._profile_cache.set(user_id, result)
+            return dict(result)
 
         except Exception as e:
             logger.error(f"Error getting user profile: {e}")
             return None
 
+    def invalidate_profile(self, user_id: str):
+        """
+        Drop a user's cached profile, so the next lookup fetches it from LINE
+
+        Args:
+            user_id: LINE user ID
+        """
+        self._profile_cache.delete(user_id)
+
     def reply_text(self, reply_token: str, text: str, quick_reply: Optional[QuickReply] = None):
         """
         Send simple text reply
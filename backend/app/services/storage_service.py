@@ -1,15 +1,20 @@
 from minio import Minio
 from minio.error import S3Error
-from typing import Optional, BinaryIO
-import hashlib
+from typing import Optional, BinaryIO, Iterator, List, Dict
+import asyncio
 import logging
 from datetime import timedelta
 import io
+from urllib.parse import quote
 
 from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Cached presigned URLs are handed out with at least this much validity left
+PRESIGNED_URL_MIN_VALIDITY = timedelta(minutes=10)
+
 
 class StorageService:
     def __init__(self):
@@ -21,6 +26,11 @@ class StorageService:
         )
         self.bucket_name = settings.MINIO_BUCKET_NAME
         self._bucket_checked = False
+        # Entry TTLs are set per URL from its own lifetime
+        self._presigned_url_cache = TTLCache(
+            maxsize=settings.PRESIGNED_URL_CACHE_SIZE,
+            ttl=0
+        )
 
     def _ensure_bucket_exists(self):
         """Create bucket if it doesn't exist (lazy initialization)"""
@@ -44,18 +54,38 @@ class StorageService:
         file_data: BinaryIO,
         object_name: str,
         content_type: str = "application/octet-stream",
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        skip_existing: bool = False
     ) -> str:
-        """Upload file to MinIO"""
+        """
+        Upload file to MinIO
+
+        Args:
+            file_data: File-like object positioned anywhere
+            object_name: Object key in the bucket
+            content_type: MIME type stored with the object
+            metadata: Optional user metadata
+            skip_existing: Skip the PUT if the object already exists. Only
+                safe for content-addressed keys, where an existing object is
+                guaranteed to hold the same bytes.
+
+        Returns:
+            Object name
+        """
         self._ensure_bucket_exists()
         try:
+            if skip_existing and await self.file_exists(object_name):
+                logger.info(f"Object already stored, skipping upload: {object_name}")
+                return object_name
+
             # Get file size
             file_data.seek(0, 2)  # Seek to end
             file_size = file_data.tell()
             file_data.seek(0)  # Seek back to start
 
-            # Upload
-            self.client.put_object(
+            # Upload (in a worker thread so the event loop can overlap other I/O)
+            await asyncio.to_thread(
+                self.client.put_object,
                 bucket_name=self.bucket_name,
                 object_name=object_name,
                 data=file_data,
@@ -83,23 +113,159 @@ class StorageService:
             logger.error(f"Error downloading file: {e}")
             raise
 
+    async def get_stream(self, object_name: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Open an object for streaming
+
+        The GET is issued before returning so errors surface to the caller;
+        the returned iterator yields chunks and releases the connection when
+        exhausted. It is a plain iterator, so StreamingResponse drains it in
+        its threadpool without blocking the event loop.
+
+        Args:
+            object_name: Object key in the bucket
+            chunk_size: Bytes per yielded chunk
+
+        Returns:
+            Iterator over the object's bytes
+        """
+        self._ensure_bucket_exists()
+        try:
+            response = await asyncio.to_thread(self.client.get_object, self.bucket_name, object_name)
+        except S3Error as e:
+            logger.error(f"Error opening file stream: {e}")
+            raise
+
+        def iter_chunks() -> Iterator[bytes]:
+            try:
+                yield from response.stream(chunk_size)
+            finally:
+                response.close()
+                response.release_conn()
+
+        return iter_chunks()
+
+    def _get_cached_presigned_url(
+        self,
+        object_name: str,
+        expires: timedelta,
+        download_filename: Optional[str] = None
+    ) -> Optional[str]:
+        return self._presigned_url_cache.get((object_name, expires, download_filename))
+
+    def _cache_presigned_url(
+        self,
+        object_name: str,
+        expires: timedelta,
+        url: str,
+        download_filename: Optional[str] = None
+    ) -> None:
+        # Reuse a URL until only PRESIGNED_URL_MIN_VALIDITY of its lifetime is left
+        ttl = (expires - PRESIGNED_URL_MIN_VALIDITY).total_seconds()
+        if ttl > 0:
+            self._presigned_url_cache.set((object_name, expires, download_filename), url, ttl=ttl)
+
     async def get_presigned_url(
         self,
         object_name: str,
-        expires: timedelta = timedelta(hours=1)
+        expires: timedelta = timedelta(hours=1),
+        cache: bool = True,
+        download_filename: Optional[str] = None
     ) -> str:
-        """Get presigned URL for file download"""
+        """
+        Get presigned URL for file download
+
+        Args:
+            object_name: Object key in the bucket
+            expires: URL lifetime
+            cache: Reuse a previously signed URL for the same object. A cached
+                URL may have as little as PRESIGNED_URL_MIN_VALIDITY left, so
+                pass False when the caller promises the full lifetime.
+            download_filename: If set, MinIO serves the object as an
+                attachment with this filename
+
+        Returns:
+            Presigned URL
+        """
+        if cache:
+            url = self._get_cached_presigned_url(object_name, expires, download_filename)
+            if url is not None:
+                return url
+
+        response_headers = None
+        if download_filename:
+            response_headers = {
+                "response-content-disposition": f"attachment; filename*=UTF-8''{quote(download_filename)}"
+            }
+
         try:
             url = self.client.presigned_get_object(
                 bucket_name=self.bucket_name,
                 object_name=object_name,
-                expires=expires
+                expires=expires,
+                response_headers=response_headers
             )
-            return url
         except S3Error as e:
             logger.error(f"Error getting presigned URL: {e}")
             raise
 
+        if cache:
+            self._cache_presigned_url(object_name, expires, url, download_filename)
+        return url
+
+    async def get_presigned_urls_batch(
+        self,
+        object_names: List[str],
+        expires: timedelta = timedelta(hours=1),
+        cache: bool = True
+    ) -> Dict[str, Optional[str]]:
+        """
+        Get presigned download URLs for many objects at once
+
+        Presigning is local HMAC work, so the whole batch is signed in one
+        worker thread rather than one await per object. URLs still in the
+        presigned URL cache are reused without signing.
+
+        Args:
+            object_names: Object keys to sign (duplicates are signed once)
+            expires: URL lifetime
+            cache: Reuse cached URLs; pass False when the caller needs each
+                URL's full lifetime (e.g. to store its expiry)
+
+        Returns:
+            Mapping of object name to URL, or None if signing failed
+        """
+        urls = {}
+        to_sign = []
+        for object_name in dict.fromkeys(object_names):
+            url = self._get_cached_presigned_url(object_name, expires) if cache else None
+            if url is not None:
+                urls[object_name] = url
+            else:
+                to_sign.append(object_name)
+
+        def sign_all() -> Dict[str, Optional[str]]:
+            signed = {}
+            for object_name in to_sign:
+                try:
+                    signed[object_name] = self.client.presigned_get_object(
+                        bucket_name=self.bucket_name,
+                        object_name=object_name,
+                        expires=expires
+                    )
+                except Exception as e:
+                    logger.warning(f"Error getting presigned URL for {object_name}: {e}")
+                    signed[object_name] = None
+            return signed
+
+        if to_sign:
+            signed = await asyncio.to_thread(sign_all)
+            for object_name, url in signed.items():
+                if cache and url is not None:
+                    self._cache_presigned_url(object_name, expires, url)
+            urls.update(signed)
+        return urls
+
     async def delete_file(self, object_name: str):
         """Delete file from MinIO"""
         try:
@@ -112,21 +278,11 @@ class StorageService:
     async def file_exists(self, object_name: str) -> bool:
         """Check if file exists"""
         try:
-            self.client.stat_object(self.bucket_name, object_name)
+            await asyncio.to_thread(self.client.stat_object, self.bucket_name, object_name)
             return True
         except S3Error:
             return False
 
-    @staticmethod
-    def calculate_hash(file_data: BinaryIO) -> str:
-        """Calculate SHA-256 hash of file"""
-        sha256 = hashlib.sha256()
-        file_data.seek(0)
-        while chunk := file_data.read(8192):
-            sha256.update(chunk)
-        file_data.seek(0)
-        return sha256.hexdigest()
-
     async def get_file_info(self, object_name: str) -> dict:
         """Get file metadata"""
         try:
@@ -159,6 +315,24 @@ class StorageService:
             logger.error(f"Error downloading file (sync): {e}")
             raise
 
+    def get_presigned_url_sync(
+        self,
+        object_name: str,
+        expires: timedelta = timedelta(hours=1)
+    ) -> str:
+        """
+        Synchronous, uncached version of get_presigned_url for use in Celery tasks
+        """
+        try:
+            return self.client.presigned_get_object(
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                expires=expires
+            )
+        except S3Error as e:
+            logger.error(f"Error getting presigned URL (sync): {e}")
+            raise
+
     def upload_file_sync(
         self,
         file_data: BinaryIO,
@@ -0,0 +1,91 @@
+"""
+Tag Service - Keep the normalized tags / file_tags tables in step with files.ai_tags
+
+files.ai_tags stays as the denormalized copy for display; tag lookups
+(e.g. tag suggestions) go through file_tags, indexed on (tag_id, file_id).
+The statements built here run on either a sync or an async session.
+"""
+
+from typing import Dict, Iterable, List, Optional, Union
+from uuid import UUID
+from sqlalchemy import delete, select, literal, values, column, String, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.database import Tag, FileTag
+
+# tags.name is VARCHAR(100)
+MAX_TAG_LENGTH = 100
+
+
+def _normalize_tags(tags: Iterable[Union[str, Dict]]) -> Dict[str, Optional[float]]:
+    """Map tag name -> confidence, from plain names or {'tag', 'confidence'} dicts"""
+    normalized: Dict[str, Optional[float]] = {}
+    for tag in tags:
+        if isinstance(tag, dict):
+            name, confidence = tag.get('tag'), tag.get('confidence')
+        else:
+            name, confidence = tag, None
+
+        name = str(name or "").strip()[:MAX_TAG_LENGTH]
+        if not name or name in normalized:
+            continue
+
+        try:
+            normalized[name] = float(confidence) if confidence is not None else None
+        except (TypeError, ValueError):
+            normalized[name] = None
+    return normalized
+
+
+def build_replace_file_tags(
+    file_id: Union[str, UUID],
+    tags: Iterable[Union[str, Dict]],
+    user_confirmed: bool = False
+) -> List:
+    """
+    Build the statements that replace a file's tags
+
+    Execute them in order in one transaction: drop the file's current
+    file_tags rows, create any tags that don't exist yet, then link the
+    file to each tag with its confidence.
+
+    Args:
+        file_id: File to tag
+        tags: Tag names, or AI tag dicts with 'tag' and 'confidence'
+        user_confirmed: Whether the user set these tags themselves
+
+    Returns:
+        List of statements to execute
+    """
+    statements = [delete(FileTag).where(FileTag.file_id == file_id)]
+
+    normalized = _normalize_tags(tags)
+    if not normalized:
+        return statements
+
+    statements.append(
+        pg_insert(Tag)
+        .values([{'name': name} for name in normalized])
+        .on_conflict_do_nothing(index_elements=[Tag.name])
+    )
+
+    new_tags = values(
+        column("name", String),
+        column("confidence", Float),
+        name="new_tags"
+    ).data(list(normalized.items()))
+    statements.append(
+        pg_insert(FileTag)
+        .from_select(
+            [FileTag.file_id, FileTag.tag_id, FileTag.confidence_score, FileTag.is_user_confirmed],
+            select(
+                literal(file_id, FileTag.file_id.type),
+                Tag.id,
+                new_tags.c.confidence,
+                literal(user_confirmed)
+            ).join(new_tags, Tag.name == new_tags.c.name)
+        )
+        .on_conflict_do_nothing(index_elements=[FileTag.file_id, FileTag.tag_id])
+    )
+
+    return statements
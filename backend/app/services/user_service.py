@@ -0,0 +1,127 @@
+"""
+User Service - Look up and register users arriving from LINE
+
+Shared by the webhook handlers and the LINE ingest worker.
+"""
+
+import logging
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import select, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.cache import get_sync_cache
+from app.core.config import settings
+from app.models.database import User as UserModel
+from app.services.line_service import line_service
+
+logger = logging.getLogger(__name__)
+
+# The hottest query in the webhook path on a cache miss. Built once so each
+# call only binds the LINE user ID and hits the compiled-statement cache.
+_user_id_by_line_id_query = select(UserModel.id).where(
+    UserModel.line_user_id == bindparam("line_user_id")
+)
+
+
+def _line_user_cache_key(line_user_id: str) -> str:
+    return f"line_user:{line_user_id}"
+
+
+def get_cached_line_user_id(line_user_id: str) -> Optional[UUID]:
+    """
+    Get the user ID for a LINE user ID from the Redis cache
+
+    Returns None on a miss or if Redis is unavailable.
+    """
+    cache = get_sync_cache()
+    if cache is None:
+        return None
+
+    try:
+        raw = cache.get(_line_user_cache_key(line_user_id))
+        return UUID(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"Error reading LINE user cache: {e}")
+        return None
+
+
+def cache_line_user_id(line_user_id: str, user_id) -> None:
+    """Store a LINE user ID -> user ID mapping for LINE_USER_CACHE_TTL seconds"""
+    cache = get_sync_cache()
+    if cache is None:
+        return
+
+    try:
+        cache.setex(
+            _line_user_cache_key(line_user_id),
+            settings.LINE_USER_CACHE_TTL,
+            str(user_id)
+        )
+    except Exception as e:
+        logger.warning(f"Error writing LINE user cache: {e}")
+
+
+def get_or_create_line_user_id_sync(line_user_id: str, db: Session) -> Optional[UUID]:
+    """
+    Get the user ID for a LINE user, creating the user from their LINE profile if new
+
+    Every LINE event needs this, and the mapping never changes, so it is
+    served from Redis when possible and only falls back to the database
+    (and LINE) on a miss. With LINE_SKIP_GET_USER_PROFILE set, new users
+    are created without a profile lookup.
+
+    Args:
+        line_user_id: LINE user ID of the event source
+        db: Synchronous database session
+
+    Concurrent events from a new user (e.g. several photos sent at once,
+    each ingested by its own task) may all try to create them; the insert
+    skips on conflict and the loser reads back the winner's row.
+
+    Returns:
+        User ID, or None if the user is new and their profile can't be
+        fetched, or on a database error
+    """
+    user_id = get_cached_line_user_id(line_user_id)
+    if user_id is not None:
+        return user_id
+
+    try:
+        result = db.execute(_user_id_by_line_id_query, {"line_user_id": line_user_id})
+        user_id = result.scalar_one_or_none()
+
+        if not user_id:
+            user_values = {"line_user_id": line_user_id}
+            if not settings.LINE_SKIP_GET_USER_PROFILE:
+                profile = line_service.get_user_profile(line_user_id)
+                if not profile:
+                    return None
+
+                user_values["display_name"] = profile['display_name']
+                user_values["picture_url"] = profile.get('picture_url')
+
+            result = db.execute(
+                pg_insert(UserModel)
+                .values(**user_values)
+                .on_conflict_do_nothing(index_elements=[UserModel.line_user_id])
+                .returning(UserModel.id)
+            )
+            user_id = result.scalar_one_or_none()
+            db.commit()
+
+            if user_id is None:
+                # Created by a concurrent event in the meantime
+                result = db.execute(_user_id_by_line_id_query, {"line_user_id": line_user_id})
+                user_id = result.scalar_one()
+            else:
+                logger.info(f"Created new user: {line_user_id}")
+
+        cache_line_user_id(line_user_id, user_id)
+        return user_id
+
+    except Exception as e:
+        logger.error(f"Error getting/creating user: {e}")
+        db.rollback()
+        return None
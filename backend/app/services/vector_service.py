@@ -1,5 +1,9 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    SearchParams, QuantizationSearchParams
+)
 from typing import List, Dict, Optional
 import logging
 import uuid
@@ -8,10 +12,35 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Keep an int8 copy of every vector in RAM for search: a quarter of the
+# float32 size. The float32 originals live on disk and are only read to
+# rescore the top candidates.
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(
+        type=ScalarType.INT8,
+        quantile=0.99,
+        always_ram=True
+    )
+)
+
+# Fetch twice the requested hits from the int8 index, then rescore them
+# against the originals so ranking matches full-precision search
+SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
 
 class VectorService:
     def __init__(self):
-        self.client = QdrantClient(url=settings.QDRANT_URL)
+        client_kwargs = {
+            "url": settings.QDRANT_URL,
+            "prefer_grpc": settings.QDRANT_PREFER_GRPC,
+            "grpc_port": settings.QDRANT_GRPC_PORT,
+        }
+        # Sync client for Celery tasks; async client for the API, so vector
+        # calls don't block the event loop. Both connect lazily.
+        self.client = QdrantClient(**client_kwargs)
+        self.async_client = AsyncQdrantClient(**client_kwargs)
         self.collection_name = settings.QDRANT_COLLECTION_NAME
         self.vector_size = settings.QDRANT_VECTOR_SIZE
         self._ensure_collection_exists()
@@ -27,13 +56,24 @@ class VectorService:
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        on_disk=True
+                    ),
+                    quantization_config=QUANTIZATION_CONFIG
                 )
                 logger.info(f"Created Qdrant collection: {self.collection_name}")
             else:
                 logger.info(f"Qdrant collection already exists: {self.collection_name}")
 
+                # Collections created before quantization was enabled
+                info = self.client.get_collection(self.collection_name)
+                if info.config.quantization_config is None:
+                    self.client.update_collection(
+                        collection_name=self.collection_name,
+                        quantization_config=QUANTIZATION_CONFIG
+                    )
+                    logger.info(f"Enabled quantization on Qdrant collection: {self.collection_name}")
+
         except Exception as e:
             logger.error(f"Error creating Qdrant collection: {e}")
             raise
@@ -57,7 +97,7 @@ class VectorService:
                 }
             )
 
-            self.client.upsert(
+            await self.async_client.upsert(
                 collection_name=self.collection_name,
                 points=[point]
             )
@@ -91,12 +131,13 @@ class VectorService:
                     )
                 search_filter = Filter(must=conditions)
 
-            results = self.client.search(
+            results = await self.async_client.search(
                 collection_name=self.collection_name,
                 query_vector=query_vector,
                 limit=limit,
                 score_threshold=score_threshold,
-                query_filter=search_filter
+                query_filter=search_filter,
+                search_params=SEARCH_PARAMS
             )
 
             # Format results
@@ -120,7 +161,7 @@ class VectorService:
     async def delete_vector(self, point_id: str):
         """Delete vector from Qdrant"""
         try:
-            self.client.delete(
+            await self.async_client.delete(
                 collection_name=self.collection_name,
                 points_selector=[point_id]
             )
@@ -133,7 +174,7 @@ class VectorService:
     async def delete_by_file_id(self, file_id: str):
         """Delete all vectors for a specific file"""
         try:
-            self.client.delete(
+            await self.async_client.delete(
                 collection_name=self.collection_name,
                 points_selector=Filter(
                     must=[
@@ -153,7 +194,7 @@ class VectorService:
     async def get_collection_info(self) -> Dict:
         """Get collection statistics"""
         try:
-            info = self.client.get_collection(self.collection_name)
+            info = await self.async_client.get_collection(self.collection_name)
             return {
                 "name": info.name,
                 "vector_count": info.points_count,
@@ -163,6 +204,10 @@ class VectorService:
             logger.error(f"Error getting collection info: {e}")
             raise
 
+    async def close(self):
+        """Close the async client's connections"""
+        await self.async_client.close()
+
     # Synchronous methods for Celery tasks
     def add_vector_sync(
         self,
@@ -172,6 +217,9 @@ class VectorService:
     ) -> str:
         """
         Synchronous version of add_vector for use in Celery tasks
+
+        Doesn't wait for Qdrant to apply the point: the task only needs the
+        write accepted, and the point is searchable moments later.
         """
         try:
             point_id = str(uuid.uuid4())
@@ -187,7 +235,8 @@ class VectorService:
 
             self.client.upsert(
                 collection_name=self.collection_name,
-                points=[point]
+                points=[point],
+                wait=False
             )
 
             logger.info(f"Added vector for file (sync): {file_id}")
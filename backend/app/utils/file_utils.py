@@ -10,13 +10,26 @@ def get_file_extension(filename: str) -> str:
     return Path(filename).suffix.lower()
 
 
-def get_mime_type(filename: str, file_data: bytes = None) -> str:
-    """Get MIME type from filename or file content"""
+# libmagic identifies formats from their leading bytes; more is wasted work
+MIME_SNIFF_SIZE = 4096
+
+# Loading the magic database is expensive, so share one handle (it locks internally)
+_mime_magic = magic.Magic(mime=True)
+
+
+def get_mime_type(filename: str, file_head: bytes = None) -> str:
+    """
+    Get MIME type from filename or file content
+
+    Args:
+        filename: Original filename, used as a fallback
+        file_head: Leading bytes of the file; only the first MIME_SNIFF_SIZE
+            are inspected, so callers don't need to pass the whole file
+    """
     # Try from content first (more accurate)
-    if file_data:
+    if file_head:
         try:
-            mime = magic.Magic(mime=True)
-            return mime.from_buffer(file_data)
+            return _mime_magic.from_buffer(file_head[:MIME_SNIFF_SIZE])
         except:
             pass
 
@@ -25,6 +38,35 @@ def get_mime_type(filename: str, file_data: bytes = None) -> str:
     return mime_type or "application/octet-stream"
 
 
+# MIME types for common extensions, so named files can skip libmagic
+EXT_TO_MIME = {
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".txt": "text/plain",
+    ".csv": "text/csv",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".mp4": "video/mp4",
+    ".mov": "video/quicktime",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".zip": "application/zip",
+}
+
+
+def get_mime_type_from_extension(filename: str) -> Optional[str]:
+    """Get MIME type for a well-known extension, or None if unknown"""
+    return EXT_TO_MIME.get(get_file_extension(filename))
+
+
 def is_allowed_file(filename: str, allowed_extensions: str) -> bool:
     """Check if file extension is allowed"""
     ext = get_file_extension(filename).lstrip('.')
@@ -32,11 +74,15 @@ def is_allowed_file(filename: str, allowed_extensions: str) -> bool:
     return ext.lower() in allowed
 
 
-def generate_unique_filename(original_filename: str, user_id: str, file_hash: str) -> str:
-    """Generate unique filename for storage"""
-    ext = get_file_extension(original_filename)
-    # Use hash for uniqueness
-    return f"{user_id}/{file_hash[:8]}/{file_hash}{ext}"
+def generate_blob_path(file_hash: str) -> str:
+    """
+    Generate content-addressed storage path for a file
+
+    Identical content maps to the same object, so it is stored once no
+    matter how many users upload it. The original filename lives only in
+    the database row.
+    """
+    return f"blobs/{file_hash[:2]}/{file_hash}"
 
 
 def sanitize_filename(filename: str) -> str:
@@ -55,6 +101,19 @@ def sanitize_filename(filename: str) -> str:
     return ''.join(safe_chars)
 
 
+def escape_like(value: str, escape_char: str = "/") -> str:
+    """
+    Escape LIKE/ILIKE wildcards so user input matches literally
+
+    Use with ilike(..., escape=escape_char).
+    """
+    return (
+        value.replace(escape_char, escape_char * 2)
+        .replace("%", f"{escape_char}%")
+        .replace("_", f"{escape_char}_")
+    )
+
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size to human readable format"""
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -0,0 +1,25 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+
+def encode_cursor(uploaded_at: datetime, file_id: UUID) -> str:
+    """Encode the (uploaded_at, id) of the last row into an opaque cursor"""
+    raw = f"{uploaded_at.isoformat()}|{file_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decode an opaque cursor back into (uploaded_at, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        uploaded_at, file_id = raw.split('|', 1)
+        return datetime.fromisoformat(uploaded_at), UUID(file_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
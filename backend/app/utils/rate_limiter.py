@@ -220,16 +220,15 @@ class QuotaTracker:
                 'error': error
             }
 
-            # Add to sorted set with timestamp as score
+            # Add to sorted set with timestamp as score, and keep only the
+            # last 7 days of history. Both go in one round trip, since this
+            # runs inline in every AI analysis.
             score = int(datetime.utcnow().timestamp())
-            self.redis.zadd(
-                self.history_key,
-                {json.dumps(log_entry): score}
-            )
-
-            # Keep only last 7 days of history
             seven_days_ago = int((datetime.utcnow() - timedelta(days=7)).timestamp())
-            self.redis.zremrangebyscore(self.history_key, 0, seven_days_ago)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zadd(self.history_key, {json.dumps(log_entry): score})
+            pipe.zremrangebyscore(self.history_key, 0, seven_days_ago)
+            pipe.execute()
 
         except Exception as e:
             logger.error(f"Error logging request: {e}")
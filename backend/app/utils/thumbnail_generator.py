@@ -11,7 +11,6 @@ from PIL import Image
 import io
 import logging
 from typing import Optional, Tuple
-import hashlib
 
 logger = logging.getLogger(__name__)
 
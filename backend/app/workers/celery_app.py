@@ -14,6 +14,7 @@ celery_app = Celery(
         "app.workers.tasks.file_processing",
         "app.workers.tasks.thumbnail",
         "app.workers.tasks.notifications",
+        "app.workers.tasks.line_ingest",
     ]
 )
 
@@ -45,7 +46,9 @@ celery_app.conf.update(
     task_max_retries=3,
 
     # Worker settings
-    worker_prefetch_multiplier=4,
+    # One task at a time per process, so short LINE ingest tasks aren't
+    # stuck behind prefetched long AI processing runs
+    worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
 
     # Beat schedule (for periodic tasks)
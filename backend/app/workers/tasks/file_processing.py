@@ -2,14 +2,16 @@ from celery import Task
 from typing import Dict, Optional
 import logging
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from app.workers.celery_app import celery_app
+from app.core.cache import invalidate_file_list_cache_sync
 from app.core.database import SessionLocal
 from app.models.database import File as FileModel
 from app.services.ai_service import ai_service
 from app.services.storage_service import storage_service
+from app.services.tag_service import build_replace_file_tags
 from app.services.vector_service import vector_service
 from app.utils.text_extractor import TextExtractor
 from app.utils.metadata_extractor import metadata_extractor
@@ -25,6 +27,113 @@ class FileProcessingTask(Task):
         return super().__call__(*args, **kwargs)
 
 
+def _reuse_processed_duplicate(db: Session, file_record: FileModel, user_id: str) -> Optional[Dict]:
+    """
+    Reuse the AI analysis of identical content that was already processed
+
+    Identical bytes (same file_hash, e.g. the same file uploaded by another
+    user or re-sent through LINE) give the same text, so the analysis cached
+    for that text applies as is, and the download, text extraction and AI
+    analysis are skipped entirely. Only that cached AI output is used:
+    other files' summaries and tags may carry their owners' edits.
+
+    Returns:
+        Processing result, or None if there is no cached analysis
+    """
+    if not file_record.file_hash:
+        return None
+
+    ai_result = ai_service.get_cached_analysis_for_file(file_record.file_hash)
+    if ai_result is None:
+        return None
+
+    # Metadata comes from the bytes themselves and users can't edit it
+    file_metadata = db.execute(
+        select(FileModel.file_metadata)
+        .where(
+            FileModel.file_hash == file_record.file_hash,
+            FileModel.id != file_record.id,
+            FileModel.file_metadata.isnot(None)
+        )
+        .limit(1)
+    ).scalar()
+    if file_metadata:
+        file_record.file_metadata = file_metadata
+
+    _apply_ai_result(db, file_record, ai_result, user_id)
+    db.commit()
+    invalidate_file_list_cache_sync(user_id)
+
+    logger.info(f"Reused cached analysis for duplicate content: {file_record.id}")
+
+    return {
+        'file_id': str(file_record.id),
+        'status': 'completed',
+        'suggested_filename': ai_result['suggested_filename'],
+        'summary': ai_result['summary'],
+        'tags': [tag['tag'] for tag in ai_result['tags']],
+        'progress': 100
+    }
+
+
+def _apply_ai_result(db: Session, file_record: FileModel, ai_result: Dict, user_id: str) -> None:
+    """Write an AI analysis to the file record, its tags and Qdrant; the caller commits"""
+    file_record.ai_generated_filename = ai_result['suggested_filename']
+    file_record.final_filename = ai_result['suggested_filename']
+    file_record.summary = ai_result['summary']
+    file_record.ai_tags = [tag['tag'] for tag in ai_result['tags']]
+    file_record.processing_status = 'completed'
+    file_record.processed_at = datetime.utcnow()
+
+    # Normalized copy of the tags for tag lookups
+    for statement in build_replace_file_tags(file_record.id, ai_result['tags']):
+        db.execute(statement)
+
+    vector_service.add_vector_sync(
+        file_id=str(file_record.id),
+        embedding=ai_result['embedding'],
+        payload={
+            "filename": file_record.final_filename,
+            "summary": file_record.summary,
+            "tags": file_record.ai_tags,
+            "user_id": str(user_id)
+        }
+    )
+
+
+def _dispatch_follow_up_tasks(file_record: FileModel, file_id: str, user_id: str) -> None:
+    """Queue the completion notification and thumbnail generation for a processed file"""
+    # Dispatch notification (fire and forget)
+    try:
+        from app.workers.tasks.notifications import send_processing_complete
+        send_processing_complete.delay(file_id, user_id)
+        logger.info(f"Dispatched processing complete notification for {file_id}")
+    except Exception as e:
+        logger.warning(f"Failed to dispatch notification: {e}")
+
+    # Dispatch thumbnail generation task (fire and forget)
+    try:
+        if file_record.mime_type:
+            from app.workers.tasks.thumbnail import (
+                generate_thumbnail,
+                generate_pdf_thumbnail,
+                generate_video_thumbnail
+            )
+
+            if file_record.mime_type.startswith('image/'):
+                generate_thumbnail.delay(file_id)
+                logger.info(f"Dispatched image thumbnail generation for {file_id}")
+            elif file_record.mime_type == 'application/pdf':
+                generate_pdf_thumbnail.delay(file_id)
+                logger.info(f"Dispatched PDF thumbnail generation for {file_id}")
+            elif file_record.mime_type.startswith('video/'):
+                generate_video_thumbnail.delay(file_id)
+                logger.info(f"Dispatched video thumbnail generation for {file_id}")
+    except Exception as e:
+        logger.warning(f"Failed to dispatch thumbnail generation: {e}")
+        # Don't fail the main task if thumbnail dispatch fails
+
+
 @celery_app.task(
     bind=True,
     base=FileProcessingTask,
@@ -44,6 +153,7 @@ def process_uploaded_file(self, file_id: str, user_id: str) -> Dict:
         Dict with processing results
     """
     db = SessionLocal()
+    file_record = None
 
     try:
         logger.info(f"Starting background processing for file_id={file_id}, user_id={user_id}")
@@ -70,6 +180,14 @@ def process_uploaded_file(self, file_id: str, user_id: str) -> Dict:
         # Update status to processing
         file_record.processing_status = 'processing'
         db.commit()
+        invalidate_file_list_cache_sync(user_id)
+
+        # Identical content that was already processed is copied rather
+        # than downloaded and analyzed again
+        reused_result = _reuse_processed_duplicate(db, file_record, user_id)
+        if reused_result is not None:
+            _dispatch_follow_up_tasks(file_record, file_id, user_id)
+            return reused_result
 
         # Download file from MinIO
         self.update_state(
@@ -117,6 +235,7 @@ def process_uploaded_file(self, file_id: str, user_id: str) -> Dict:
             file_record.processing_status = 'completed'
             file_record.processed_at = datetime.utcnow()
             db.commit()
+            invalidate_file_list_cache_sync(user_id)
 
             return {
                 'file_id': file_id,
@@ -136,69 +255,23 @@ def process_uploaded_file(self, file_id: str, user_id: str) -> Dict:
             filename=file_record.original_filename
         )
 
-        # Update file record with AI results
+        # Update file record with AI results and store the embedding
         self.update_state(
             state='PROCESSING',
             meta={'status': 'Updating file metadata', 'progress': 80}
         )
 
-        file_record.ai_generated_filename = ai_result['suggested_filename']
-        file_record.final_filename = ai_result['suggested_filename']
-        file_record.summary = ai_result['summary']
-        file_record.ai_tags = [tag['tag'] for tag in ai_result['tags']]
-        file_record.processing_status = 'completed'
-        file_record.processed_at = datetime.utcnow()
-
-        # Store embedding in Qdrant
-        self.update_state(
-            state='PROCESSING',
-            meta={'status': 'Storing vector embedding', 'progress': 90}
-        )
-
-        vector_service.add_vector_sync(
-            file_id=str(file_record.id),
-            embedding=ai_result['embedding'],
-            payload={
-                "filename": file_record.final_filename,
-                "summary": file_record.summary,
-                "tags": file_record.ai_tags,
-                "user_id": str(user_id)
-            }
-        )
-
+        _apply_ai_result(db, file_record, ai_result, user_id)
         db.commit()
+        invalidate_file_list_cache_sync(user_id)
 
-        logger.info(f"File processing completed successfully: {file_id}")
+        # Later uploads of the same bytes can reuse this analysis
+        if file_record.file_hash:
+            ai_service.link_file_analysis(file_record.file_hash, text_content)
 
-        # Dispatch notification (fire and forget)
-        try:
-            from app.workers.tasks.notifications import send_processing_complete
-            send_processing_complete.delay(file_id, user_id)
-            logger.info(f"Dispatched processing complete notification for {file_id}")
-        except Exception as e:
-            logger.warning(f"Failed to dispatch notification: {e}")
-
-        # Dispatch thumbnail generation task (fire and forget)
-        try:
-            if file_record.mime_type:
-                from app.workers.tasks.thumbnail import (
-                    generate_thumbnail,
-                    generate_pdf_thumbnail,
-                    generate_video_thumbnail
-                )
+        logger.info(f"File processing completed successfully: {file_id}")
 
-                if file_record.mime_type.startswith('image/'):
-                    generate_thumbnail.delay(file_id)
-                    logger.info(f"Dispatched image thumbnail generation for {file_id}")
-                elif file_record.mime_type == 'application/pdf':
-                    generate_pdf_thumbnail.delay(file_id)
-                    logger.info(f"Dispatched PDF thumbnail generation for {file_id}")
-                elif file_record.mime_type.startswith('video/'):
-                    generate_video_thumbnail.delay(file_id)
-                    logger.info(f"Dispatched video thumbnail generation for {file_id}")
-        except Exception as e:
-            logger.warning(f"Failed to dispatch thumbnail generation: {e}")
-            # Don't fail the main task if thumbnail dispatch fails
+        _dispatch_follow_up_tasks(file_record, file_id, user_id)
 
         return {
             'file_id': file_id,
@@ -212,11 +285,14 @@ def process_uploaded_file(self, file_id: str, user_id: str) -> Dict:
     except Exception as e:
         logger.error(f"Error processing file {file_id}: {e}")
 
-        # Update file status to failed
+        # Drop whatever the failed attempt left in the transaction (AI
+        # fields, tag statements), then record the failure on its own
+        db.rollback()
         if file_record:
             file_record.processing_status = 'failed'
             file_record.error_message = str(e)
             db.commit()
+            invalidate_file_list_cache_sync(user_id)
 
         # Retry the task
         raise self.retry(exc=e, countdown=60)
@@ -290,23 +366,28 @@ def cleanup_old_tasks():
 
             one_hour_ago = datetime.utcnow() - timedelta(hours=1)
 
+            # Mark them failed in one statement instead of loading each row
             result = db.execute(
-                select(FileModel).where(
+                update(FileModel)
+                .where(
                     and_(
                         FileModel.processing_status == 'processing',
                         FileModel.uploaded_at < one_hour_ago
                     )
                 )
+                .values(processing_status='failed')
+                .returning(FileModel.id, FileModel.user_id)
             )
-            stuck_files = result.scalars().all()
+            stuck_files = result.all()
 
-            for file in stuck_files:
-                file.processing_status = 'failed'
-                file.error_message = 'Processing timeout'
-                logger.warning(f"Marked stuck file as failed: {file.id}")
+            for stuck_file in stuck_files:
+                logger.warning(f"Marked stuck file as failed: {stuck_file.id}")
 
             db.commit()
 
+            for stuck_user_id in {stuck_file.user_id for stuck_file in stuck_files}:
+                invalidate_file_list_cache_sync(stuck_user_id)
+
             logger.info(f"Cleanup completed. Marked {len(stuck_files)} stuck files as failed")
 
         finally:
@@ -343,6 +424,7 @@ def reprocess_file(file_id: str, user_id: str) -> Dict:
         file_record.processing_status = 'pending'
         file_record.error_message = None
         db.commit()
+        invalidate_file_list_cache_sync(user_id)
 
     finally:
         db.close()
@@ -0,0 +1,228 @@
+from celery import Task
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+import hashlib
+import logging
+import tempfile
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.workers.celery_app import celery_app
+from app.core.cache import invalidate_file_list_cache_sync
+from app.core.database import SessionLocal
+from app.models.database import File as FileModel
+from app.services.line_service import line_service
+from app.services.storage_service import storage_service
+from app.services.user_service import get_or_create_line_user_id_sync
+from app.templates.flex_messages import flex_templates
+from app.utils.file_utils import (
+    generate_blob_path,
+    get_mime_type,
+    get_mime_type_from_extension,
+    MIME_SNIFF_SIZE
+)
+from app.workers.tasks.file_processing import process_uploaded_file
+
+logger = logging.getLogger(__name__)
+
+# Per message type: filename prefix and fallback extension for generated names
+MEDIA_NAMING = {
+    "image": ("image", "jpg"),
+    "video": ("video", "mp4"),
+}
+
+# Text pushed when a file can't be stored, by message type
+INGEST_FAILED_TEXT = {
+    "file": "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดไฟล์",
+    "image": "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดรูปภาพ",
+    "video": "ขออภัย เกิดข้อผิดพลาดในการอัปโหลดวิดีโอ",
+}
+
+
+# Downloads up to this size stay in memory; larger ones spill to a temp file
+CONTENT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# LINE content is read in 1 MiB chunks: each chunk is a fresh bytes object
+# from urllib3 either way, so bigger chunks mean far fewer allocations and
+# loop iterations per download
+CONTENT_CHUNK_SIZE = 1 << 20
+
+# Runs MinIO uploads alongside the file record insert. Each worker process
+# handles one task at a time, so one upload thread is enough; it is started
+# lazily, after the worker has forked.
+_upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="line-ingest-upload")
+
+
+def _spool_content(chunks: Iterator[bytes]) -> Tuple[BinaryIO, str, int, bytes]:
+    """
+    Write streamed content to a spooled temp file in a single pass
+
+    The content is hashed and its head captured for MIME sniffing as it
+    arrives, so it never has to be held in memory whole or re-read.
+
+    Returns:
+        (spooled file positioned at 0, sha256 hex digest, size in bytes,
+        leading bytes for MIME sniffing)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=CONTENT_SPOOL_MAX_SIZE)
+    hasher = hashlib.sha256()
+    file_head = b""
+    file_size = 0
+
+    try:
+        for chunk in chunks:
+            if len(file_head) < MIME_SNIFF_SIZE:
+                file_head += chunk[:MIME_SNIFF_SIZE - len(file_head)]
+            hasher.update(chunk)
+            spool.write(chunk)
+            file_size += len(chunk)
+    except Exception:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, hasher.hexdigest(), file_size, file_head
+
+
+class LineIngestTask(Task):
+    """Base task for storing content sent through LINE"""
+    pass
+
+
+@celery_app.task(
+    bind=True,
+    base=LineIngestTask,
+    name="app.workers.tasks.line_ingest.ingest_line_content",
+    max_retries=3,
+    default_retry_delay=10
+)
+def ingest_line_content(
+    self,
+    message_id: str,
+    line_user_id: str,
+    kind: str,
+    filename: Optional[str] = None
+) -> Dict:
+    """
+    Download a file/image/video message from LINE, store it and queue AI processing
+
+    The webhook replies as soon as this is queued; the outcome reaches the
+    user as a push message.
+
+    Args:
+        message_id: LINE message ID holding the content
+        line_user_id: LINE user ID of the sender
+        kind: Message type: "file", "image" or "video"
+        filename: Original filename (file messages only)
+
+    Returns:
+        Dict with the stored file's ID and status
+    """
+    db = SessionLocal()
+
+    try:
+        logger.info(f"Ingesting LINE {kind} message: {message_id}")
+
+        # A failed lookup (LINE profile or database error) is usually
+        # transient, so retry rather than drop the content
+        user_id = get_or_create_line_user_id_sync(line_user_id, db)
+        if not user_id:
+            raise ValueError(f"Could not resolve LINE user: {line_user_id}")
+
+        # Download content from LINE, hashing it on the way into a spool
+        content_file, file_hash, file_size, file_head = _spool_content(
+            line_service.stream_content(message_id, CONTENT_CHUNK_SIZE)
+        )
+
+        with content_file:
+            # Detect MIME type, and name images/videos after it. Named
+            # files with a well-known extension skip libmagic.
+            mime_type = get_mime_type_from_extension(filename) if filename else None
+            if not mime_type:
+                mime_type = get_mime_type(filename or "", file_head)
+            if not filename:
+                prefix, default_ext = MEDIA_NAMING[kind]
+                ext = mime_type.split('/')[-1] if '/' in mime_type else default_ext
+                filename = f"{prefix}_{message_id}.{ext}"
+
+            # Content-addressed storage path, as for API uploads
+            object_name = generate_blob_path(file_hash)
+
+            # Upload to MinIO while the file record is inserted: neither
+            # depends on the other. The record is only committed once the
+            # upload has succeeded, so a failed upload leaves no row behind.
+            upload = _upload_executor.submit(
+                storage_service.upload_file_sync,
+                file_data=content_file,
+                object_name=object_name,
+                content_type=mime_type
+            )
+
+            try:
+                # Create file record, unless this user already has the same content
+                result = db.execute(
+                    pg_insert(FileModel)
+                    .values(
+                        user_id=user_id,
+                        original_filename=filename,
+                        final_filename=filename,
+                        file_path=object_name,
+                        file_size=file_size,
+                        mime_type=mime_type,
+                        file_hash=file_hash,
+                        processing_status='pending'
+                    )
+                    .on_conflict_do_nothing(
+                        index_elements=[FileModel.user_id, FileModel.file_hash],
+                        index_where=FileModel.is_deleted == False
+                    )
+                    .returning(FileModel.id)
+                )
+                file_id = result.scalar_one_or_none()
+            finally:
+                # The spool has to stay open until the upload is done with it
+                wait([upload])
+
+            # Re-raises an upload error; the insert is rolled back below
+            upload.result()
+
+        db.commit()
+
+        if file_id is None:
+            logger.info(f"Duplicate file from LINE: {file_hash}")
+            line_service.push_text(line_user_id, f"มีไฟล์ {filename} อยู่ในระบบแล้ว")
+            return {'message_id': message_id, 'status': 'duplicate'}
+
+        invalidate_file_list_cache_sync(user_id)
+
+        # Start background processing
+        process_uploaded_file.delay(str(file_id), str(user_id))
+
+        # Send confirmation with Flex Message
+        flex_content = flex_templates.file_upload_confirmation(
+            filename=filename,
+            file_size=file_size,
+            file_type=mime_type,
+            file_id=str(file_id)
+        )
+        line_service.push_flex(
+            line_user_id,
+            alt_text=f"อัปโหลด {filename} สำเร็จ",
+            flex_content=flex_content
+        )
+
+        logger.info(f"File uploaded from LINE and queued for processing: {file_id}")
+
+        return {'message_id': message_id, 'file_id': str(file_id), 'status': 'pending'}
+
+    except Exception as e:
+        logger.error(f"Error ingesting LINE message {message_id}: {e}")
+        db.rollback()
+
+        if self.request.retries >= self.max_retries:
+            line_service.push_text(line_user_id, INGEST_FAILED_TEXT.get(kind, INGEST_FAILED_TEXT["file"]))
+            raise
+
+        raise self.retry(exc=e)
+
+    finally:
+        db.close()
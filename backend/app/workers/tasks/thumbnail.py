@@ -2,9 +2,11 @@ from celery import Task
 from typing import Dict, Optional
 import logging
 import io
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from app.workers.celery_app import celery_app
+from app.core.config import settings
+from app.core.cache import invalidate_file_list_cache_sync
 from app.core.database import SessionLocal
 from app.models.database import File as FileModel
 from app.services.storage_service import storage_service
@@ -19,6 +21,27 @@ class ThumbnailTask(Task):
     pass
 
 
+def set_thumbnail(file_record: FileModel, thumbnail_path: str) -> None:
+    """
+    Point a file at a new thumbnail and persist a presigned URL for it
+
+    Storing the URL with its expiry lets the API serve it without signing;
+    readers re-sign it once it is close to expiring.
+    """
+    expires = timedelta(seconds=settings.THUMBNAIL_URL_EXPIRES)
+    expires_at = datetime.now(timezone.utc) + expires
+
+    file_record.thumbnail_path = thumbnail_path
+    try:
+        file_record.thumbnail_url = storage_service.get_presigned_url_sync(thumbnail_path, expires)
+        file_record.thumbnail_url_expires_at = expires_at
+    except Exception as e:
+        # Readers sign a missing URL on demand
+        logger.warning(f"Failed to presign thumbnail URL: {e}")
+        file_record.thumbnail_url = None
+        file_record.thumbnail_url_expires_at = None
+
+
 @celery_app.task(
     bind=True,
     base=ThumbnailTask,
@@ -79,9 +102,10 @@ def generate_thumbnail(self, file_id: str) -> Dict:
             content_type='image/jpeg'
         )
 
-        # Update file record with thumbnail path
-        file_record.thumbnail_path = thumbnail_path
+        # Update file record with thumbnail path and URL
+        set_thumbnail(file_record, thumbnail_path)
         db.commit()
+        invalidate_file_list_cache_sync(file_record.user_id)
 
         logger.info(f"Thumbnail generated successfully for file: {file_id}")
 
@@ -160,9 +184,10 @@ def generate_pdf_thumbnail(self, file_id: str) -> Dict:
             content_type='image/jpeg'
         )
 
-        # Update file record with thumbnail path
-        file_record.thumbnail_path = thumbnail_path
+        # Update file record with thumbnail path and URL
+        set_thumbnail(file_record, thumbnail_path)
         db.commit()
+        invalidate_file_list_cache_sync(file_record.user_id)
 
         logger.info(f"PDF thumbnail generated successfully for file: {file_id}")
 
@@ -241,9 +266,10 @@ def generate_video_thumbnail(self, file_id: str) -> Dict:
             content_type='image/jpeg'
         )
 
-        # Update file record with thumbnail path
-        file_record.thumbnail_path = thumbnail_path
+        # Update file record with thumbnail path and URL
+        set_thumbnail(file_record, thumbnail_path)
         db.commit()
+        invalidate_file_list_cache_sync(file_record.user_id)
 
         logger.info(f"Video thumbnail generated successfully for file: {file_id}")
 
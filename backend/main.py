@@ -1,11 +1,14 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 import redis
 
 from app.core.config import settings
+from app.core.cache import initialize_cache, close_cache
 from app.core.database import engine, Base
+from app.services.vector_service import vector_service
 from app.api.endpoints import auth, files, search, webhook, collections
 from app.utils.rate_limiter import initialize_rate_limiter
 
@@ -39,16 +42,25 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Failed to initialize rate limiter: {e}. Rate limiting disabled.")
 
+    # Initialize async Redis cache
+    try:
+        await initialize_cache()
+    except Exception as e:
+        logger.warning(f"Failed to initialize Redis cache: {e}. Caching disabled.")
+
     yield
 
     # Shutdown
     logger.info("Shutting down Drive2 application...")
+    await close_cache()
+    await vector_service.close()
 
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
 )